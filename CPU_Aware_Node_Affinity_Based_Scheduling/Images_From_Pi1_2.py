@@ -1,21 +1,58 @@
 import os
 import sys
+import time
+_IMPORT_T0 = time.perf_counter()  # start-up breakdown: module import
 import cv2
-import base64
+import binascii
 import random
 import math as m
 import numpy as np
-import paho.mqtt.client as mqtt
-import psycopg2
 from datetime import datetime
-import mediapipe as mp
 import socket
 import logging
 import queue
-from concurrent.futures import ProcessPoolExecutor, as_completed
+import signal
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+import multiprocessing
+from multiprocessing import shared_memory, resource_tracker, util as mp_util
 import subprocess
 import threading
 import re
+import csv
+import gc
+import glob
+import json
+import hashlib
+import zlib
+from collections import OrderedDict
+from enum import IntEnum
+from multiprocessing.managers import BaseManager
+
+# Heavy or optional-at-runtime modules are imported where they are first needed:
+# mediapipe in _load_mediapipe() (workers and the parent's preload), psycopg2 in
+# connect_db() (only with DB_ENABLED), paho-mqtt in main().
+mp = None
+
+try:  # optional fast hash for the pose cache
+    import xxhash
+except ImportError:
+    xxhash = None
+
+try:  # optional SIMD base64 decoder
+    import pybase64
+except ImportError:
+    pybase64 = None
+
+try:  # optional runtime limits for BLAS/OpenMP pools that are already loaded
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
+
+try:  # optional /metrics endpoint
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
 
 # --- begin: node-local output setup (added) ---
 # Save outputs on the node where the pod runs, under:
@@ -23,15 +60,92 @@ import re
 NODE_NAME = os.getenv("NODE_NAME", "unknown-node")
 POD_NAME = os.getenv("POD_NAME", "unknown-pod")
 ANALYZED_BASE = os.getenv("ANALYZED_DIR", "/app/analyzed_images")
-RUN_ID = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+RUN_ID = os.getenv("RUN_ID") or datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
 OUT_DIR = os.path.join(ANALYZED_BASE, NODE_NAME, POD_NAME, RUN_ID)
-os.makedirs(OUT_DIR, exist_ok=True)
+# A Job recreates a failed pod under a new name (possibly on another node), so POD_NAME
+# and RUN_ID can't locate an interrupted run. With JOB_NAME (the pod's job-name label)
+# the CSV and resume marker are kept under <ANALYZED_DIR>/jobs/<JOB_NAME>/ instead.
+JOB_NAME = os.getenv("JOB_NAME", "")
 
 def out_path(filename: str) -> str:
     """Build absolute path under OUT_DIR for images/CSV/etc."""
     return os.path.join(OUT_DIR, filename)
 # --- end: node-local output setup (added) ---
 
+# ---------------------------
+# CPU layout (cgroup v2)
+# ---------------------------
+def _read_file(path):
+    try:
+        with open(path, "r") as f:
+            return f.read()
+    except OSError:
+        return None
+
+def _cgroup_dir():
+    """This process's cgroup v2 directory, or None on cgroup v1 / non-Linux."""
+    text = _read_file("/proc/self/cgroup") or ""
+    for line in text.splitlines():
+        if line.startswith("0::"):
+            path = os.path.join("/sys/fs/cgroup", line[3:].lstrip("/"))
+            if os.path.exists(os.path.join(path, "cpu.stat")):
+                return path
+    return None
+
+def _cgroup_cpu_quota(cg_dir):
+    """cpu.max quota/period in CPUs, or None when unlimited."""
+    text = (_read_file(os.path.join(cg_dir, "cpu.max")) or "max").split()
+    if text[0] != "max" and len(text) > 1:
+        return int(text[0]) / int(text[1])
+    return None
+
+def _cgroup_cpu_limit(cg_dir):
+    """CPUs available to the cgroup: cpu.max quota/period, else all cores."""
+    quota = _cgroup_cpu_quota(cg_dir)
+    return quota if quota is not None else float(os.cpu_count() or 1)
+
+def _parse_cpu_list(text):
+    """'0-3,6' -> [0, 1, 2, 3, 6]"""
+    cpus = []
+    for part in (text or "").strip().split(","):
+        if not part:
+            continue
+        lo, _, hi = part.partition("-")
+        cpus.extend(range(int(lo), int(hi or lo) + 1))
+    return cpus
+
+def plan_cpu_layout(pin=False, reserve_parent=False, cg_dir=None):
+    """
+    Worker budget from the container's limits instead of host cores:
+    - usable cpus: cpuset.cpus.effective, intersected with this process's affinity mask
+    - budget: usable cpus, capped by the cpu.max quota (rounded down, at least 1)
+    - reserve_parent keeps one core (the first usable one) for the parent's threads
+    - pin: workers get the remaining cores, one each (ignored without sched_setaffinity,
+      e.g. on macOS: parent_cpu and worker_cpus are then None)
+    """
+    cg_dir = cg_dir or _cgroup_dir()
+    if hasattr(os, "sched_getaffinity"):
+        cpus = set(os.sched_getaffinity(0))
+    else:
+        cpus = set(range(os.cpu_count() or 1))
+    if cg_dir:
+        cpuset = set(_parse_cpu_list(_read_file(os.path.join(cg_dir, "cpuset.cpus.effective"))))
+        cpus = (cpus & cpuset) or cpus
+    cpus = sorted(cpus)
+    quota = _cgroup_cpu_quota(cg_dir) if cg_dir else None
+    budget = len(cpus) if quota is None else max(1, min(len(cpus), int(quota)))
+    parent_cpu = cpus[0] if reserve_parent and budget > 1 else None
+    workers = budget - 1 if parent_cpu is not None else budget
+    can_pin = pin and hasattr(os, "sched_setaffinity")
+    worker_cpus = None
+    if can_pin:
+        worker_cpus = [c for c in cpus if c != parent_cpu][:workers]
+    return {"cpus": cpus, "quota": quota, "budget": budget, "workers": workers,
+            "parent_cpu": parent_cpu if can_pin else None, "worker_cpus": worker_cpus}
+
+def _format_cpus(cpus):
+    return ",".join(str(c) for c in cpus) if cpus else "-"
+
 # ---------------------------
 # Config (env overrides)
 # ---------------------------
@@ -40,8 +154,84 @@ PORT = int(os.environ.get("MQTT_PORT", "1883"))
 TOPIC = os.environ.get("MQTT_TOPIC", "images/#")
 OUTPUT_BASE = os.environ.get("OUTPUT_DIR", "./analyzed_images")
 
-_default_workers = os.cpu_count() or 4
-NUM_WORKERS = int(os.environ.get("NUM_WORKERS", str(max(1, _default_workers))))
+# NUM_WORKERS defaults to the container's CPU budget (cgroup v2 cpu.max and
+# cpuset.cpus.effective), not os.cpu_count(), which reports host cores.
+# PIN_WORKERS=true pins each worker to its own core with sched_setaffinity;
+# RESERVE_PARENT_CPU (default: same as PIN_WORKERS) leaves one core of the budget
+# to the parent's MQTT, decode and sampler threads, which are pinned there when pinning.
+# The layout is planned by configure(), so CPU_LAYOUT/NUM_WORKERS are None until startup().
+PIN_WORKERS = os.environ.get("PIN_WORKERS", "false").lower() == "true"
+RESERVE_PARENT_CPU = os.environ.get("RESERVE_PARENT_CPU", str(PIN_WORKERS)).lower() == "true"
+CPU_LAYOUT = None
+NUM_WORKERS = None
+# Threads per worker for OpenCV and OpenMP/OpenBLAS/MKL; "auto" splits the CPU budget
+# across workers (at least 1 each), "0" keeps the libraries' defaults. MediaPipe's
+# solutions API has no TFLite thread setting, so with PIN_WORKERS each worker is pinned
+# to WORKER_THREADS cores, which bounds its inference threads instead.
+WORKER_THREADS = os.environ.get("WORKER_THREADS", "auto").lower()
+
+# Publish each decoded frame once in shared memory; workers attach by name
+SHARED_FRAMES = os.environ.get("SHARED_FRAMES", "true").lower() == "true"
+
+# Copy fan-out: "chunked" sends contiguous copy ranges per task and streams
+# per-copy results back through a queue; "per_copy" submits one future per copy.
+DISPATCH_MODE = os.environ.get("DISPATCH_MODE", "chunked").lower()
+CHUNK_SIZE = os.environ.get("CHUNK_SIZE", "auto")  # "auto" or a fixed int
+# auto mode keeps per-task overhead below this share of per-chunk compute
+CHUNK_OVERHEAD_PCT = float(os.environ.get("CHUNK_OVERHEAD_PCT", "1.0"))
+# auto mode never goes below this many copies per task (unless a loop is too small
+# to give every worker a chunk), so the parent isn't back to one future per copy
+CHUNK_MIN = int(os.environ.get("CHUNK_MIN", "4"))
+
+# MediaPipe Pose model (0 lite, 1 full, 2 heavy). With ADAPTIVE_COMPLEXITY=true,
+# stream mode keeps all three per worker and picks, per frame, the heaviest model
+# whose predicted latency (p95 service time x backlog) stays under LATENCY_SLO_S.
+MODEL_COMPLEXITY = int(os.environ.get("MODEL_COMPLEXITY", "2"))
+ADAPTIVE_COMPLEXITY = os.environ.get("ADAPTIVE_COMPLEXITY", "false").lower() == "true"
+LATENCY_SLO_S = float(os.environ.get("LATENCY_SLO_S", "1.0"))
+ADAPTIVE_WINDOW = int(os.environ.get("ADAPTIVE_WINDOW", "50"))  # frames per model in the p95 window
+
+# Stream mode tracking: each Pi's frames are routed to the same single-worker lane
+# (crc32(pi_id) % NUM_WORKERS), which keeps a per-Pi Pose session with
+# static_image_mode=False so the person detector only runs when tracking is lost.
+# A session is reset when the Pi has been silent for more than TRACKING_GAP_S, and
+# closed (its Pose graph freed) once the Pi has been silent for TRACKING_IDLE_S.
+TRACKING = os.environ.get("TRACKING", "false").lower() == "true"
+TRACKING_GAP_S = float(os.environ.get("TRACKING_GAP_S", "2.0"))
+TRACKING_IDLE_S = float(os.environ.get("TRACKING_IDLE_S", "300"))
+
+# Inference resolution: Pose runs on a 1/INFER_SCALE frame (1, 2, 4 or 8) prepared once
+# per frame in the decode stage, already converted to RGB. "dct" decodes JPEGs directly at
+# the reduced size (libjpeg DCT scaling), "resize" shrinks the full decode (INTER_AREA).
+# Landmarks are normalized, so angles and drawings still use full-resolution pixels.
+INFER_SCALE = int(os.environ.get("INFER_SCALE", "1"))
+INFER_SCALE_METHOD = os.environ.get("INFER_SCALE_METHOD", "dct").lower()
+
+# Opt-in pose result cache keyed by a content hash of the decoded frame
+POSE_CACHE = os.environ.get("POSE_CACHE", "false").lower() == "true"
+POSE_CACHE_SIZE = int(os.environ.get("POSE_CACHE_SIZE", "256"))
+POSE_CACHE_TTL_S = float(os.environ.get("POSE_CACHE_TTL_S", "300"))
+
+# Decode stage: paho's network thread only enqueues raw payloads
+DECODE_THREADS = int(os.environ.get("DECODE_THREADS", "2"))
+DECODED_QUEUE_SIZE = int(os.environ.get("DECODED_QUEUE_SIZE", "2"))
+# Raw payloads waiting for a decoder are buffered per pi_id, INGEST_QUEUE_SIZE each.
+# On overflow: "drop_oldest" evicts that Pi's oldest payload, "keep_latest" keeps only
+# the newest one (a single slot per Pi), "block" stalls the MQTT callback for up to
+# INGEST_BLOCK_TIMEOUT_S and then drops the new payload.
+INGEST_QUEUE_SIZE = int(os.environ.get("INGEST_QUEUE_SIZE", "4"))
+INGEST_POLICY = os.environ.get("INGEST_POLICY", "drop_oldest").lower()
+INGEST_BLOCK_TIMEOUT_S = float(os.environ.get("INGEST_BLOCK_TIMEOUT_S", "30"))
+
+# Writer stage: annotated images are written by background threads in each
+# worker (WRITER_THREADS=0 writes inline as before)
+WRITER_THREADS = int(os.environ.get("WRITER_THREADS", "1"))
+WRITER_QUEUE_SIZE = int(os.environ.get("WRITER_QUEUE_SIZE", "8"))
+JPEG_QUALITY = int(os.environ.get("JPEG_QUALITY", "95"))
+# write each frame's annotated image once per worker; later copies reuse its filename
+WRITER_SKIP_IDENTICAL = os.environ.get("WRITER_SKIP_IDENTICAL", "false").lower() == "true"
+# draw "no/insufficient landmarks" text; when false such frames are saved from the original JPEG bytes
+ANNOTATE_MISSES = os.environ.get("ANNOTATE_MISSES", "true").lower() == "true"
 
 # DB (can disable via DB_ENABLED=false)
 DB_HOST = os.environ.get("DB_HOST", "aws-0-eu-north-1.pooler.supabase.com")
@@ -51,36 +241,114 @@ DB_PASSWORD = os.environ.get("DB_PASSWORD", "University12@")
 DB_PORT = int(os.environ.get("DB_PORT", "5432"))
 DB_SSLMODE = os.environ.get("DB_SSLMODE", "require")
 DB_ENABLED = os.environ.get("DB_ENABLED", "false").lower() == "true"
-
-COPIES_SCHEDULE = [100 * i for i in range(1, 11)]  # 10,20,...,100
+# background sink: rows are flushed in multi-row INSERTs on size or time
+DB_BATCH_SIZE = int(os.environ.get("DB_BATCH_SIZE", "200"))
+DB_FLUSH_INTERVAL_S = float(os.environ.get("DB_FLUSH_INTERVAL_S", "1.0"))
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "2"))
+
+# "benchmark": one loop per COPIES_SCHEDULE entry, one image each, fanned out to that many copies
+# "stream":    every incoming frame is analyzed once, pipelined through the pool
+MODE = os.environ.get("MODE", "benchmark").lower()
+# comma-separated copies per loop, e.g. "10,20,40" (default 100,200,...,1000)
+COPIES_SCHEDULE = ([int(c) for c in os.environ.get("COPIES_SCHEDULE", "").split(",") if c.strip()]
+                   or [100 * i for i in range(1, 11)])
+# stream mode: frames in flight before ingest stops pulling (backpressure; default 2 x NUM_WORKERS),
+# rolling stats window (frames) and how often stats are logged/appended
+STREAM_MAX_INFLIGHT = os.environ.get("STREAM_MAX_INFLIGHT")
+STREAM_STATS_WINDOW = int(os.environ.get("STREAM_STATS_WINDOW", "500"))
+STREAM_STATS_INTERVAL_S = float(os.environ.get("STREAM_STATS_INTERVAL_S", "10"))
+# resource sampler: auto (tegrastats, else psutil, else /proc), tegrastats, proc, cgroup, psutil or none
+SAMPLER_BACKEND = os.environ.get("SAMPLER_BACKEND", "auto").lower()
+# samples kept per figure (fixed ring; 4096 x 200 ms ~ 13.6 min), summarized as min/p50/p95/max/mean
+SAMPLER_RING_SIZE = int(os.environ.get("SAMPLER_RING_SIZE", "4096"))
+SAMPLER_INTERVAL_MS = int(os.environ.get("SAMPLER_INTERVAL_MS", "200"))
+# append the raw sample timeline with loop markers to <CSV_PATH stem>_timeline.csv
+SAMPLER_TIMELINE = os.environ.get("SAMPLER_TIMELINE", "false").lower() == "true"
+# Worker start method: "fork" (default on Linux) shares the parent's imported modules
+# and preloaded model files copy-on-write (the parent gc.freeze()s first so collections
+# don't dirty those pages); "forkserver" forks workers from a server that has preloaded
+# this module, cv2 and mediapipe once; "spawn" (default elsewhere) starts each from
+# scratch. Forking after cv2/mediapipe have loaded is unsafe on macOS, hence spawn there.
+# configure() validates it and creates MP_CONTEXT.
+START_METHOD = os.environ.get("START_METHOD", "fork" if sys.platform.startswith("linux") else "spawn").lower()
+MP_CONTEXT = None
+# Warm-up before subscribing: every worker loads its models and runs one dummy inference,
+# then waits at a barrier so each warm-up task lands on a different worker (the same
+# barrier spreads the end-of-loop writer flush over every worker).
+# READY_FILE (e.g. for a readiness probe) is written once the pool is hot and MQTT is connected.
+WARMUP = os.environ.get("WARMUP", "true").lower() == "true"
+WARMUP_TIMEOUT_S = float(os.environ.get("WARMUP_TIMEOUT_S", "120"))
+READY_FILE = os.environ.get("READY_FILE", "")
+# Prometheus /metrics (per-stage latency histograms, pool/queue gauges); 0 disables
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "8000"))
 CSV_PATH = os.environ.get("CSV_PATH", "pi1_2_results.csv")
+# each loop's row is appended as soon as it finishes; fsync makes it survive a node crash
+CSV_FSYNC = os.environ.get("CSV_FSYNC", "false").lower() == "true"
+# continue after the last completed loop recorded in the resume marker (default: <CSV_PATH>.resume.json)
+RESUME = os.environ.get("RESUME", "true").lower() == "true"
 
 # ---------------------------
 # Logging
 # ---------------------------
 LOGGER = logging.getLogger("posture_bm_one_per_loop")
-LOGGER.setLevel(logging.INFO)
-_fmt = logging.Formatter("%(asctime)s | %(levelname)s | %(message)s")
-_sh = logging.StreamHandler(sys.stdout)
-_sh.setFormatter(_fmt)
-LOGGER.addHandler(_sh)
 
-os.makedirs(OUTPUT_BASE, exist_ok=True)
-LOGGER.info("🚀 Starting benchmark on %s | MQTT %s:%s | topic=%s | workers=%s",
-            socket.gethostname(), BROKER, PORT, TOPIC, NUM_WORKERS)
+def setup_logging():
+    """Attach the stdout handler once per process (the parent in startup(), spawned workers in _worker_init)."""
+    if LOGGER.handlers:
+        return
+    LOGGER.setLevel(logging.INFO)
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(asctime)s | %(levelname)s | %(message)s"))
+    LOGGER.addHandler(handler)
+
+def log_layout():
+    LOGGER.info("🚀 Starting benchmark on %s | MQTT %s:%s | topic=%s | workers=%s",
+                socket.gethostname(), BROKER, PORT, TOPIC, NUM_WORKERS)
+    LOGGER.info("🧮 CPU layout: usable cpus=[%s] quota=%s budget=%d | workers=%d x %s threads%s | parent cpu=%s",
+                _format_cpus(CPU_LAYOUT["cpus"]), CPU_LAYOUT["quota"], CPU_LAYOUT["budget"], NUM_WORKERS,
+                WORKER_THREADS or "default",
+                f" pinned to [{_format_cpus(CPU_LAYOUT['worker_cpus'])}]" if CPU_LAYOUT["worker_cpus"] else "",
+                CPU_LAYOUT["parent_cpu"] if CPU_LAYOUT["parent_cpu"] is not None else "shared")
+    if NUM_WORKERS > CPU_LAYOUT["budget"]:
+        LOGGER.warning("⚠️ NUM_WORKERS=%d exceeds the CPU budget of %d; expect cgroup throttling",
+                       NUM_WORKERS, CPU_LAYOUT["budget"])
+    if PIN_WORKERS and not CPU_LAYOUT["worker_cpus"]:
+        LOGGER.warning("⚠️ PIN_WORKERS=true but sched_setaffinity is unavailable; workers are not pinned")
+
+def configure():
+    """
+    Resolve the settings that probe the machine or may be rejected: the CPU layout (and the
+    NUM_WORKERS / WORKER_THREADS / STREAM_MAX_INFLIGHT defaults derived from it), the
+    multiprocessing context and the ingest buffer. Raises ValueError for a bad
+    START_METHOD or INGEST_POLICY. Called by startup(); tools that only need the
+    layout or MP_CONTEXT (bench.py threads) call it directly.
+    """
+    global CPU_LAYOUT, NUM_WORKERS, WORKER_THREADS, STREAM_MAX_INFLIGHT, MP_CONTEXT, ingest
+    if START_METHOD not in multiprocessing.get_all_start_methods():
+        raise ValueError(f"START_METHOD must be one of {tuple(multiprocessing.get_all_start_methods())}, "
+                         f"got {START_METHOD!r}")
+    ingest = IngestBuffer(INGEST_QUEUE_SIZE, INGEST_POLICY, INGEST_BLOCK_TIMEOUT_S)
+    CPU_LAYOUT = plan_cpu_layout(PIN_WORKERS, RESERVE_PARENT_CPU)
+    NUM_WORKERS = int(os.environ.get("NUM_WORKERS", str(CPU_LAYOUT["workers"])))
+    if WORKER_THREADS == "auto":
+        WORKER_THREADS = max(1, CPU_LAYOUT["budget"] // max(1, NUM_WORKERS))
+    WORKER_THREADS = int(WORKER_THREADS)
+    STREAM_MAX_INFLIGHT = int(STREAM_MAX_INFLIGHT or 2 * NUM_WORKERS)
+    MP_CONTEXT = multiprocessing.get_context(START_METHOD)
+    if START_METHOD == "forkserver":
+        MP_CONTEXT.set_forkserver_preload(["__main__", "numpy", "cv2", "mediapipe"])
 
 # --- begin: node-local overrides (added) ---
-# Prefer node-local base dir and write CSV inside OUT_DIR by default.
+# Prefer node-local base dir and write CSV inside OUT_DIR by default (per Job with JOB_NAME).
 OUTPUT_BASE = ANALYZED_BASE
-os.makedirs(OUT_DIR, exist_ok=True)
-CSV_PATH = os.environ.get("CSV_PATH", out_path("results.csv"))
+CSV_PATH = os.environ.get("CSV_PATH") or (
+    os.path.join(ANALYZED_BASE, "jobs", JOB_NAME, "results.csv") if JOB_NAME else out_path("results.csv"))
 # --- end: node-local overrides (added) ---
 
 # ---------------------------
 # DB
 # ---------------------------
-conn = None
-cursor = None
+db_pool = None
 
 def ensure_table(cur):
     cur.execute(
@@ -101,12 +369,14 @@ def ensure_table(cur):
     )
 
 def connect_db():
-    global conn, cursor
+    global db_pool
     if not DB_ENABLED:
         LOGGER.warning("DB disabled via DB_ENABLED=false; skipping DB writes.")
         return
     try:
-        conn = psycopg2.connect(
+        import psycopg2.pool
+        db_pool = psycopg2.pool.ThreadedConnectionPool(
+            1, max(1, DB_POOL_SIZE),
             host=DB_HOST,
             dbname=DB_NAME,
             user=DB_USER,
@@ -114,17 +384,242 @@ def connect_db():
             port=DB_PORT,
             sslmode=DB_SSLMODE,
         )
-        cursor = conn.cursor()
-        ensure_table(cursor)
-        conn.commit()
-        LOGGER.info("✅ DB connected and table ensured.")
+        conn = db_pool.getconn()
+        try:
+            with conn.cursor() as cur:
+                ensure_table(cur)
+            conn.commit()
+        finally:
+            db_pool.putconn(conn)
+        LOGGER.info("✅ DB connected (pool=%d) and table ensured.", DB_POOL_SIZE)
     except Exception as e:
         LOGGER.error("❌ DB connection failed: %s", e)
         LOGGER.warning("Continuing without DB writes.")
+        db_pool = None
+
+INSERT_SQL = """
+    INSERT INTO posture_log
+    (pi_id, filename, received_time, analyzed_time, neck_angle, body_angle,
+     posture_status, landmarks_detected, processed_by)
+    VALUES %s
+"""
+
+class DBSink:
+    """
+    Background writer for posture_log so result collection never waits on the network.
+    - put() only enqueues a row tuple
+    - a batcher thread flushes when DB_BATCH_SIZE rows are buffered or
+      DB_FLUSH_INTERVAL_S has passed, using one multi-row INSERT per batch
+    - flushes run on up to DB_POOL_SIZE pooled connections
+    """
+    def __init__(self, pool, batch_size=200, flush_interval_s=1.0, flushers=2):
+        from psycopg2.extras import execute_values
+        self._execute_values = execute_values
+        self.pool = pool
+        self.batch_size = max(1, batch_size)
+        self.flush_interval_s = flush_interval_s
+        self.q = queue.Queue()
+        self.flush_slots = threading.BoundedSemaphore(max(1, flushers))
+        self.lock = threading.Lock()
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.flushes = 0
+        self.flush_s_total = 0.0
+        self.flush_s_last = None
+        self.started = time.monotonic()
+        self._flush_threads = []
+        self.thread = threading.Thread(target=self._run, name="db-sink", daemon=True)
+        self.thread.start()
+
+    def put(self, row):
+        self.q.put(row)
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval_s
+        while True:
+            try:
+                row = self.q.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                row = False
+            if row is None:
+                break
+            if row:
+                batch.append(row)
+            if len(batch) >= self.batch_size or (batch and time.monotonic() >= deadline):
+                self._dispatch(batch)
+                batch = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval_s
+        if batch:
+            self._dispatch(batch)
+
+    def _dispatch(self, batch):
+        self.flush_slots.acquire()
+        t = threading.Thread(target=self._flush, args=(batch,), daemon=True)
+        self._flush_threads = [x for x in self._flush_threads if x.is_alive()] + [t]
+        t.start()
+
+    def _flush(self, batch):
+        t0 = time.perf_counter()
         conn = None
-        cursor = None
+        try:
+            conn = self.pool.getconn()
+            with conn.cursor() as cur:
+                self._execute_values(cur, INSERT_SQL, batch, page_size=len(batch))
+            conn.commit()
+            dt = time.perf_counter() - t0
+            if METRICS is not None:
+                METRICS.observe("db_write", dt)
+            with self.lock:
+                self.rows_written += len(batch)
+                self.flushes += 1
+                self.flush_s_total += dt
+                self.flush_s_last = dt
+        except Exception as e:
+            LOGGER.error("DB flush of %d rows failed: %s", len(batch), e)
+            with self.lock:
+                self.rows_failed += len(batch)
+            if conn is not None:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+        finally:
+            if conn is not None:
+                self.pool.putconn(conn)
+            self.flush_slots.release()
+
+    def stats(self):
+        with self.lock:
+            elapsed = time.monotonic() - self.started
+            return {
+                "db_rows_written": self.rows_written,
+                "db_rows_failed": self.rows_failed,
+                "db_pending": self.q.qsize(),
+                "db_flushes": self.flushes,
+                "db_flush_ms_avg": round(self.flush_s_total / self.flushes * 1000.0, 3) if self.flushes else None,
+                "db_flush_ms_last": round(self.flush_s_last * 1000.0, 3) if self.flush_s_last is not None else None,
+                "db_rows_per_s": round(self.rows_written / elapsed, 3) if elapsed > 0 else None,
+            }
 
-connect_db()
+    def close(self):
+        self.q.put(None)
+        self.thread.join()
+        for t in self._flush_threads:
+            t.join()
+        LOGGER.info("🗄️ DB sink closed: %s", self.stats())
+
+def startup():
+    """
+    Process-level side effects, run once by main() (never at import, so spawned workers,
+    bench.py and other tools can import this module cheaply). Returns {step: seconds}.
+    """
+    steps = {"import": _IMPORT_S}
+    _timed(steps, "logging", setup_logging)
+    _timed(steps, "config", configure)
+    log_layout()
+    _timed(steps, "dirs", lambda: [os.makedirs(d, exist_ok=True)
+                                   for d in (OUTPUT_BASE, os.path.dirname(os.path.abspath(CSV_PATH)))])
+    _timed(steps, "db", connect_db)
+    return steps
+
+def _timed(steps, name, fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    steps[name] = time.perf_counter() - t0
+    return out
+
+# ---------------------------
+# Metrics (Prometheus)
+# ---------------------------
+# worker-side stages, in the order of Result.stages
+WORKER_STAGES = ("pose_process", "landmarks", "draw", "imwrite")
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Metrics:
+    """
+    Analyzer metrics served on :METRICS_PORT/metrics.
+    - posture_stage_seconds{stage}: one histogram per pipeline stage
+        mqtt_receive (PUBLISH read -> enqueued), ingest_wait, decode, frame_wait: parent ingest path
+        dispatch: submit -> result in the parent, minus time spent in the worker
+        pose_process, landmarks, draw: worker side, shipped back with each result
+        imwrite: inline writes with each result; background writes with the writer reports
+        db_write: one multi-row INSERT; end_to_end: received -> analyzed
+    - posture_pool_workers / posture_pool_inflight_tasks / posture_pool_utilization
+    - posture_worker_busy_seconds_total, posture_queue_depth{queue}
+    - posture_ingest_dropped_total{pi_id,policy}: payloads discarded by the ingest buffer
+    - posture_ready, posture_warmup_seconds
+    """
+    def __init__(self, workers):
+        self.workers = max(1, workers)
+        self._inflight = 0
+        self._lock = threading.Lock()
+        self.stage = prometheus_client.Histogram(
+            "posture_stage_seconds", "Time spent per pipeline stage", ["stage"], buckets=STAGE_BUCKETS)
+        self.busy = prometheus_client.Counter(
+            "posture_worker_busy_seconds", "Worker time spent analyzing copies")
+        prometheus_client.Gauge("posture_pool_workers", "Worker processes in the pool").set(self.workers)
+        prometheus_client.Gauge("posture_pool_inflight_tasks", "Submitted tasks not yet finished"
+                                ).set_function(lambda: self._inflight)
+        prometheus_client.Gauge("posture_pool_utilization", "Share of workers with a task (0..1)"
+                                ).set_function(lambda: min(self._inflight, self.workers) / self.workers)
+        self.queue_depth = prometheus_client.Gauge("posture_queue_depth", "Items waiting per queue", ["queue"])
+        self.ingest_dropped = prometheus_client.Counter(
+            "posture_ingest_dropped", "Payloads dropped by the ingest buffer", ["pi_id", "policy"])
+        self.model = prometheus_client.Gauge("posture_model_complexity", "Pose model used for new frames")
+        self.model.set(MODEL_COMPLEXITY)
+        self.ready = prometheus_client.Gauge("posture_ready", "1 once the pool is warm and MQTT is connected")
+        self.warmup = prometheus_client.Gauge("posture_warmup_seconds", "Pool warm-up time before the first frame")
+
+    def watch_queue(self, name, fn):
+        self.queue_depth.labels(queue=name).set_function(fn)
+
+    def drop(self, pi_id, policy):
+        self.ingest_dropped.labels(pi_id=pi_id, policy=policy).inc()
+
+    def observe(self, stage, seconds):
+        if seconds is not None:
+            self.stage.labels(stage=stage).observe(seconds)
+
+    def observe_result(self, result):
+        for stage, seconds in zip(WORKER_STAGES, result.stages or ()):
+            self.observe(stage, seconds)
+        if result.worker_seconds is not None:
+            self.busy.inc(result.worker_seconds)
+
+    def track(self, future):
+        """Count a submitted task as in flight until it completes."""
+        with self._lock:
+            self._inflight += 1
+        future.add_done_callback(self._task_done)
+        return future
+
+    def _task_done(self, _future):
+        with self._lock:
+            self._inflight -= 1
+
+METRICS = None
+
+def start_metrics():
+    global METRICS
+    if METRICS_PORT <= 0:
+        return
+    if prometheus_client is None:
+        LOGGER.warning("METRICS_PORT=%d but prometheus_client is not installed; /metrics disabled", METRICS_PORT)
+        return
+    try:
+        prometheus_client.start_http_server(METRICS_PORT)
+    except OSError as e:
+        LOGGER.warning("Could not serve /metrics on port %d: %s", METRICS_PORT, e)
+        return
+    METRICS = Metrics(NUM_WORKERS)
+    METRICS.watch_queue("ingest", ingest.qsize)
+    METRICS.watch_queue("decoded", frame_q.qsize)
+    LOGGER.info("📈 Serving Prometheus metrics on :%d/metrics", METRICS_PORT)
+
+def _track(future):
+    return METRICS.track(future) if METRICS is not None else future
 
 # ---------------------------
 # Per-process state (for workers)
@@ -138,17 +633,448 @@ colors = {
 }
 
 # globals for worker processes (initialized in _worker_init)
-_pose = None
+_poses = {}  # model_complexity -> Pose
+_sessions = {}  # (pi_id, model_complexity) -> [tracking Pose, monotonic time of last frame]
 _mp_pose = None
 _mp_drawing = None
 _mp_styles = None
-
-def _worker_init():
-    global _pose, _mp_pose, _mp_drawing, _mp_styles
-    _mp_pose = mp.solutions.pose
-    _pose = _mp_pose.Pose(static_image_mode=True, model_complexity=2)
+_result_q = None
+_pose_cache = None
+_writer = None
+_pool_barrier = None
+_worker_load_s = None  # _worker_init duration (model load)
+_written = OrderedDict()  # frame token -> filename already written by this worker
+
+def _worker_init(result_q=None, pose_cache=None, barrier=None, pin=None, threads=0):
+    global _mp_pose, _mp_drawing, _mp_styles, _result_q, _pose_cache, _writer, _pool_barrier, _worker_load_s
+    t0 = time.perf_counter()
+    setup_logging()  # no-op when forked from the parent
+    # before the models load, so their inference threads inherit the mask and limits
+    if pin is not None:
+        _pin_worker(*pin, width=max(1, threads))
+    if threads:
+        govern_threads(threads)
+    _pool_barrier = barrier
+    _result_q = result_q
+    _pose_cache = pose_cache
+    _mp_pose = _load_mediapipe().solutions.pose
+    if not (MODE == "stream" and TRACKING):  # tracking sessions are created per Pi on first use
+        for c in _model_levels():
+            _get_pose(c)
     _mp_drawing = mp.solutions.drawing_utils
     _mp_styles = mp.solutions.drawing_styles
+    if WRITER_THREADS > 0:
+        _writer = ImageWriter(WRITER_THREADS, WRITER_QUEUE_SIZE, JPEG_QUALITY)
+        # drain pending writes when the pool shuts the worker down
+        mp_util.Finalize(_writer, _writer.close, exitpriority=10)
+    _worker_load_s = time.perf_counter() - t0
+
+def _load_mediapipe():
+    global mp
+    if mp is None:
+        import mediapipe
+        mp = mediapipe
+    return mp
+
+def _model_levels():
+    """Pose model complexities this run uses."""
+    if MODE == "stream" and ADAPTIVE_COMPLEXITY:
+        return ComplexityController.LEVELS
+    return (MODEL_COMPLEXITY,)
+
+_LANDMARK_MODELS = {0: "pose_landmark_lite.tflite", 1: "pose_landmark_full.tflite", 2: "pose_landmark_heavy.tflite"}
+
+def preload_models():
+    """
+    Parent side, before the pool starts: import the Pose modules and fetch/read the
+    model files once, so workers don't each download or read them from disk.
+    Pose graphs themselves own native threads and can't be inherited across fork,
+    so every worker still builds its own in _worker_init.
+    """
+    t0 = time.perf_counter()
+    pose_mod = _load_mediapipe().solutions.pose
+    _ = mp.solutions.drawing_utils, mp.solutions.drawing_styles
+    root = os.path.dirname(mp.__file__)
+    paths = glob.glob(os.path.join(root, "modules", "pose_detection", "*.tflite"))
+    for c in _model_levels():
+        try:
+            pose_mod._download_oss_pose_landmark_model(c)  # heavy model is fetched on first use
+        except Exception as e:
+            LOGGER.warning("⚠️ Could not fetch Pose model %d in the parent: %s", c, e)
+        paths.append(os.path.join(root, "modules", "pose_landmark", _LANDMARK_MODELS[c]))
+    size = files = 0
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                size += len(f.read())  # now in the page cache, shared by every worker
+            files += 1
+        except OSError:
+            pass
+    elapsed = time.perf_counter() - t0
+    LOGGER.info("📦 Preloaded Pose modules and %d model files (%.1f MB) in %.2fs | start method=%s",
+                files, size / 1e6, elapsed, START_METHOD)
+    return elapsed
+
+def _pin_worker(slots, cpus, width=1):
+    """Take the next worker slot and pin this process to its `width` cores (cores are reused past len(cpus))."""
+    with slots.get_lock():
+        slot = slots.value
+        slots.value += 1
+    os.sched_setaffinity(0, {cpus[(slot * width + i) % len(cpus)] for i in range(width)})
+
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+def govern_threads(n):
+    """Cap this process's OpenCV and OpenMP/BLAS thread pools at n."""
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(n)  # libraries loaded from here on
+    cv2.setNumThreads(n)
+    if threadpool_limits is not None:
+        threadpool_limits(n)  # pools already loaded (e.g. numpy's OpenBLAS under fork)
+
+def _warmup(timeout_s):
+    """
+    Worker task: one dummy inference per loaded model, then wait at the pool's barrier,
+    so no worker takes a second warm-up task. Returns (pid, model load s, dummy inference s).
+    """
+    t0 = time.perf_counter()
+    dummy = np.zeros((256, 256, 3), dtype=np.uint8)
+    if _poses:
+        for pose in _poses.values():
+            pose.process(dummy)
+    else:
+        # tracking lanes create their sessions per Pi; still pull the model in once
+        with _mp_pose.Pose(static_image_mode=False, model_complexity=MODEL_COMPLEXITY) as pose:
+            pose.process(dummy)
+    cv2.imencode(".jpg", dummy)
+    infer_s = time.perf_counter() - t0
+    if _pool_barrier is not None:
+        try:
+            _pool_barrier.wait(timeout_s)
+        except threading.BrokenBarrierError:
+            pass  # the parent notices from the pids it gets back
+    return os.getpid(), _worker_load_s, infer_s
+
+def _writer_report():
+    """(stats snapshot, durations of writes finished since the last report), or None without a writer."""
+    if _writer is None:
+        return None
+    return _writer.stats(), _writer.drain_durations()
+
+def _flush_writer(timeout_s):
+    """
+    Worker task: wait for this worker's queued image writes, then wait at the pool's
+    barrier so every worker runs one flush. Returns (pid, writer report, failed file names).
+    """
+    report, failed = None, []
+    if _writer is not None:
+        _writer.flush()
+        report, failed = _writer_report(), _writer.drain_failed()
+    if _pool_barrier is not None:
+        try:
+            _pool_barrier.wait(timeout_s)
+        except threading.BrokenBarrierError:
+            pass
+    return os.getpid(), report, failed
+
+def _get_pose(complexity):
+    pose = _poses.get(complexity)
+    if pose is None:
+        pose = _poses[complexity] = _mp_pose.Pose(static_image_mode=True, model_complexity=complexity)
+    return pose
+
+def _evict_sessions(now):
+    """Close the tracking sessions of Pis that have been silent for more than TRACKING_IDLE_S."""
+    for key in [k for k, (_, last) in _sessions.items() if now - last > TRACKING_IDLE_S]:
+        _sessions.pop(key)[0].close()
+        LOGGER.info("🧹 Closed idle tracking session for %s (model %s)", *key)
+
+def _session_pose(session, complexity):
+    """Tracking Pose for one Pi; reset when the Pi's previous frame is older than TRACKING_GAP_S."""
+    now = time.monotonic()
+    _evict_sessions(now)
+    entry = _sessions.get((session, complexity))
+    if entry is None:
+        entry = _sessions[(session, complexity)] = [
+            _mp_pose.Pose(static_image_mode=False, model_complexity=complexity), now]
+    elif now - entry[1] > TRACKING_GAP_S:
+        entry[0].reset()
+    entry[1] = now
+    return entry[0]
+
+# ---------------------------
+# Writer stage
+# ---------------------------
+class ImageWriter:
+    """
+    Background JPEG writer for one worker process.
+    - bounded queue: submit() blocks when the disk falls behind
+    - items carry either an image to encode or ready-made JPEG bytes
+    - stats(): queue depth (now and peak since the last report) plus files/bytes written
+      and time spent writing
+    - flush(): waits until every queued file is on disk; failed paths are kept for drain_failed()
+    """
+    def __init__(self, threads: int = 1, queue_size: int = 8, jpeg_quality: int = 95):
+        self.q = queue.Queue(maxsize=max(1, queue_size))
+        self.params = [int(cv2.IMWRITE_JPEG_QUALITY), int(jpeg_quality)]
+        self.lock = threading.Lock()
+        self.files = 0
+        self.bytes = 0
+        self.busy_s = 0.0
+        self.errors = 0
+        self.peak = 0  # deepest queue seen by submit() since the last report
+        self.durations = []  # per-file write times not yet reported
+        self.failed = []  # file names whose write failed, not yet reported
+        self.threads = [threading.Thread(target=self._run, name=f"writer-{i}", daemon=True)
+                        for i in range(max(1, threads))]
+        for t in self.threads:
+            t.start()
+
+    def _run(self):
+        while True:
+            item = self.q.get()
+            if item is None:
+                self.q.task_done()
+                break
+            path, image, data = item
+            t0 = time.perf_counter()
+            try:
+                if data is None:
+                    ok, buf = cv2.imencode(".jpg", image, self.params)
+                    if not ok:
+                        raise RuntimeError("JPEG encode failed")
+                    data = buf
+                with open(path, "wb") as f:
+                    f.write(data)
+                dt = time.perf_counter() - t0
+                with self.lock:
+                    self.files += 1
+                    self.bytes += len(data)
+                    self.busy_s += dt
+                    if len(self.durations) < 1024:
+                        self.durations.append(dt)
+            except Exception as e:
+                with self.lock:
+                    self.errors += 1
+                    if len(self.failed) < 1024:
+                        self.failed.append(os.path.basename(path))
+                LOGGER.error("Image write failed for %s: %s", path, e)
+            finally:
+                self.q.task_done()
+
+    def submit(self, path, image=None, data=None):
+        self.q.put((path, image, data))
+        depth = self.q.qsize()
+        with self.lock:
+            self.peak = max(self.peak, depth)
+
+    def stats(self):
+        with self.lock:
+            return (os.getpid(), self.files, self.bytes, self.busy_s, self.q.qsize(), self.errors, self.peak)
+
+    def drain_durations(self):
+        """Write times since the last call; also restarts the peak queue depth."""
+        with self.lock:
+            out, self.durations = self.durations, []
+            self.peak = self.q.qsize()
+        return out
+
+    def flush(self):
+        self.q.join()
+
+    def drain_failed(self):
+        with self.lock:
+            out, self.failed = self.failed, []
+        return out
+
+    def close(self):
+        for _ in self.threads:
+            self.q.put(None)
+        for t in self.threads:
+            t.join()
+
+class WriterStats:
+    """
+    Parent-side view of all workers' writers, from the reports of the end-of-loop flush
+    (benchmark) or attached to each stream-mode result.
+    """
+    def __init__(self):
+        self.latest = {}
+        self.max_depth = 0
+        self.failed = 0  # failed writes reported by flushes since the last loop_summary
+
+    def update(self, snap):
+        if snap:
+            self.latest[snap[0]] = snap
+            self.max_depth = max(self.max_depth, snap[4], snap[6])
+
+    def queue_depth(self):
+        return sum(s[4] for s in list(self.latest.values()))
+
+    def totals(self):
+        files = sum(s[1] for s in self.latest.values())
+        nbytes = sum(s[2] for s in self.latest.values())
+        busy = sum(s[3] for s in self.latest.values())
+        return files, nbytes, busy
+
+    def loop_summary(self, before, window_s):
+        """
+        Per-loop figures against the totals taken `before` the loop. MB/s is the aggregate
+        rate over the loop's wall-clock window (first submit -> writers flushed), not the
+        per-thread rate from summed busy time.
+        """
+        files, nbytes, _ = self.totals()
+        d_files, d_bytes = files - before[0], nbytes - before[1]
+        summary = {
+            "writer_files": d_files,
+            "writer_mb_per_s": round(d_bytes / window_s / 1e6, 3) if window_s > 0 and d_files else None,
+            "writer_queue_max": self.max_depth,
+            "writer_failed": self.failed,
+        }
+        self.max_depth = 0
+        self.failed = 0
+        return summary
+
+# ---------------------------
+# Shared-memory frames
+# ---------------------------
+class SharedFrame:
+    """
+    Decoded frame copied once into a `multiprocessing.shared_memory` segment,
+    optionally followed by the RGB inference frame and the original JPEG bytes.
+    Only `descriptor` = (segment name, shape, dtype, jpeg length, inference shape)
+    crosses the process boundary; the parent calls `release()` once every copy has finished.
+    """
+    def __init__(self, img: np.ndarray, jpeg=None, infer: np.ndarray = None):
+        jpeg_len = len(jpeg) if jpeg is not None else 0
+        infer_nbytes = infer.nbytes if infer is not None else 0
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, img.nbytes + infer_nbytes + jpeg_len))
+        view = np.ndarray(img.shape, dtype=img.dtype, buffer=self.shm.buf)
+        view[:] = img
+        del view
+        if infer is not None:
+            view = np.ndarray(infer.shape, dtype=np.uint8, buffer=self.shm.buf, offset=img.nbytes)
+            view[:] = infer
+            del view
+        if jpeg_len:
+            start = img.nbytes + infer_nbytes
+            self.shm.buf[start:start + jpeg_len] = jpeg
+        self.descriptor = (self.shm.name, img.shape, img.dtype.str, jpeg_len,
+                           infer.shape if infer is not None else None)
+
+    def release(self):
+        try:
+            self.shm.close()
+        except Exception:
+            pass
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+# worker-side attachments, most recent last (name -> (shm, ndarray, jpeg memoryview, RGB inference ndarray))
+_attached = {}
+_MAX_ATTACHED = 4
+
+def _attach(frame):
+    name, shape, dtype, jpeg_len, infer_shape = frame
+    hit = _attached.pop(name, None)
+    if hit is None:
+        shm = shared_memory.SharedMemory(name=name)
+        arr = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        infer = None
+        start = arr.nbytes
+        if infer_shape is not None:
+            infer = np.ndarray(infer_shape, dtype=np.uint8, buffer=shm.buf, offset=start)
+            start += infer.nbytes
+        jpeg = shm.buf[start:start + jpeg_len] if jpeg_len else None
+        hit = (shm, arr, jpeg, infer)
+    _attached[name] = hit
+    # drop the oldest attachments; their segments belong to finished frames
+    while len(_attached) > _MAX_ATTACHED:
+        old = _attached.pop(next(iter(_attached)))
+        old_shm = old[0]
+        if old[2] is not None:
+            old[2].release()
+        del old
+        try:
+            old_shm.close()
+        except Exception:
+            pass
+    return hit
+
+def _resolve_frame(frame):
+    """Return the BGR array for a task argument (ndarray or SharedFrame descriptor)."""
+    if isinstance(frame, np.ndarray):
+        return frame
+    return _attach(frame)[1]
+
+def _resolve_infer(frame):
+    """Precomputed RGB inference frame of a shared frame, or None (the worker prepares it)."""
+    if isinstance(frame, np.ndarray):
+        return None
+    return _attach(frame)[3]
+
+def _resolve_jpeg(frame):
+    """Original JPEG bytes of a shared frame, or None when not available."""
+    if isinstance(frame, np.ndarray):
+        return None
+    jpeg = _attach(frame)[2]
+    return bytes(jpeg) if jpeg is not None else None
+
+# ---------------------------
+# Pose result cache
+# ---------------------------
+def frame_digest(img: np.ndarray) -> str:
+    """Fast content hash of a decoded frame (xxhash if installed, else blake2b)."""
+    data = np.ascontiguousarray(img).data
+    if xxhash is not None:
+        h = xxhash.xxh3_128()
+    else:
+        h = hashlib.blake2b(digest_size=16)
+    h.update(repr(img.shape).encode())
+    h.update(data)
+    return h.hexdigest()
+
+class PoseCache:
+    """
+    Bounded LRU of pose results keyed by frame digest.
+    - size: max entries; least recently used is evicted first
+    - ttl:  entries older than ttl seconds are treated as misses
+    Lives in a manager process so all workers share one cache.
+    """
+    def __init__(self, max_entries: int = 256, ttl_s: float = 300.0):
+        self.max_entries = max(1, max_entries)
+        self.ttl_s = ttl_s
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        item = self._data.get(key)
+        if item is not None and self.ttl_s > 0 and time.monotonic() - item[0] > self.ttl_s:
+            del self._data[key]
+            item = None
+        if item is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def put(self, key, value):
+        self._data[key] = (time.monotonic(), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
+
+class PoseCacheManager(BaseManager):
+    pass
+
+PoseCacheManager.register("PoseCache", PoseCache)
 
 # ---------------------------
 # Utilities
@@ -172,123 +1098,599 @@ def findAngle(x1, y1, x2, y2):
     except Exception:
         return 0
 
-def decode_image(payload: bytes):
-    # try base64 first
+# ---------------------------
+# Landmark kernels (vectorized)
+# ---------------------------
+class PostureStatus(IntEnum):
+    """Posture outcome, sent between processes as a small int; `label` is the text used in the DB."""
+    UNKNOWN = 0
+    GOOD = 1
+    BAD = 2
+    INSUFFICIENT_LANDMARKS = 3
+    NO_LANDMARKS = 4
+
+    @property
+    def label(self):
+        return _STATUS_LABELS[self]
+
+_STATUS_LABELS = {
+    PostureStatus.UNKNOWN: "Unknown",
+    PostureStatus.GOOD: "Good",
+    PostureStatus.BAD: "Bad",
+    PostureStatus.INSUFFICIENT_LANDMARKS: "Insufficient_Landmarks",
+    PostureStatus.NO_LANDMARKS: "No_Landmarks",
+}
+
+# landmark rows: (x, y, z, visibility), x/y normalized to the frame
+LM_LEFT_EAR, LM_LEFT_SHOULDER, LM_LEFT_HIP = 7, 11, 23
+REQUIRED_LANDMARKS = [LM_LEFT_SHOULDER, LM_LEFT_HIP, LM_LEFT_EAR]
+
+def landmark_rows(pose_landmarks):
+    """MediaPipe NormalizedLandmarkList -> list of 33 (x, y, z, visibility) tuples."""
+    return [(lm.x, lm.y, lm.z, lm.visibility) for lm in pose_landmarks.landmark]
+
+def angles_from_vertical(ax, ay, bx, by):
+    """Vectorized findAngle: angle in whole degrees between a->b and the upward vertical at a."""
+    abx, aby = bx - ax, by - ay
+    dot = abx * 0 + aby * -100
+    mag_ab = np.sqrt(abx ** 2 + aby ** 2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cosang = np.clip(dot / (mag_ab * 100.0), -1.0, 1.0)
+        ang = np.degrees(np.arccos(cosang))
+    return np.where(mag_ab == 0, 0, np.trunc(ang)).astype(np.int64)
+
+def score_landmarks(lms, w, h):
+    """
+    Posture scoring over one (33, 4) array or a batch (N, 33, 4); w/h are scalars or per-frame arrays.
+    - sufficient: required landmarks visible (>= 0.01) and >= 20 landmarks with visibility >= 0.9
+    - pixels truncated like int(x * w); neck = shoulder->ear, body = hip->shoulder
+    Returns arrays, shaped like the batch (0-d for a single frame): landmarks_detected,
+    neck_angle, body_angle and posture_status as PostureStatus codes.
+    """
+    lms = np.asarray(lms, dtype=np.float64)
+    vis = lms[..., 3]
+    detected = (vis[..., REQUIRED_LANDMARKS] >= 0.01).all(axis=-1) & ((vis >= 0.9).sum(axis=-1) >= 20)
+    w = np.asarray(w, dtype=np.float64)[..., None]
+    h = np.asarray(h, dtype=np.float64)[..., None]
+    px = np.trunc(lms[..., 0] * w)
+    py = np.trunc(lms[..., 1] * h)
+    sx, sy = px[..., LM_LEFT_SHOULDER], py[..., LM_LEFT_SHOULDER]
+    neck = angles_from_vertical(sx, sy, px[..., LM_LEFT_EAR], py[..., LM_LEFT_EAR])
+    body = angles_from_vertical(px[..., LM_LEFT_HIP], py[..., LM_LEFT_HIP], sx, sy)
+    good = (neck > 10) & (neck < 50) & (body < 20)
+    status = np.where(detected, np.where(good, PostureStatus.GOOD, PostureStatus.BAD),
+                      PostureStatus.INSUFFICIENT_LANDMARKS).astype(np.uint8)
+    return {
+        "landmarks_detected": detected,
+        "neck_angle": np.where(detected, neck, 0),
+        "body_angle": np.where(detected, body, 0),
+        "posture_status": status,
+    }
+
+def score_frame(rows, w, h):
+    """
+    score_landmarks for a single frame in plain Python: at one (33, 4) frame NumPy's
+    per-call overhead dominates, so workers score each result with this instead.
+    rows: 33 (x, y, z, visibility) sequences. Returns (landmarks_detected, neck_angle,
+    body_angle, PostureStatus), identical to score_landmarks.
+    """
+    if not (all(rows[i][3] >= 0.01 for i in REQUIRED_LANDMARKS)
+            and sum(1 for r in rows if r[3] >= 0.9) >= 20):
+        return False, 0, 0, PostureStatus.INSUFFICIENT_LANDMARKS
+    sx, sy = int(rows[LM_LEFT_SHOULDER][0] * w), int(rows[LM_LEFT_SHOULDER][1] * h)
+    neck = findAngle(sx, sy, int(rows[LM_LEFT_EAR][0] * w), int(rows[LM_LEFT_EAR][1] * h))
+    body = findAngle(int(rows[LM_LEFT_HIP][0] * w), int(rows[LM_LEFT_HIP][1] * h), sx, sy)
+    good = 10 < neck < 50 and body < 20
+    return True, neck, body, PostureStatus.GOOD if good else PostureStatus.BAD
+
+# ---------------------------
+# Payload decode
+# ---------------------------
+_JPEG_MAGIC = b"\xff\xd8\xff"
+_PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+_B64_CHARS = frozenset(b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/=\r\n")
+
+def sniff_payload(payload) -> str:
+    """Classify a payload from its first bytes: 'jpeg', 'png', 'base64' or 'unknown'."""
+    head = bytes(memoryview(payload)[:16])
+    if head.startswith(_JPEG_MAGIC):
+        return "jpeg"
+    if head.startswith(_PNG_MAGIC):
+        return "png"
+    if head and all(c in _B64_CHARS for c in head):
+        return "base64"
+    return "unknown"
+
+def _b64decode(payload):
+    if pybase64 is not None:
+        return pybase64.b64decode(payload)
+    return binascii.a2b_base64(payload)
+
+def _imdecode(buf, flags=None):
+    # np.frombuffer wraps the buffer without copying it
+    return cv2.imdecode(np.frombuffer(buf, np.uint8), cv2.IMREAD_COLOR if flags is None else flags)
+
+def decode_frame(payload: bytes):
+    """Decode a payload; returns (image, enc, encoded image bytes)."""
+    enc = sniff_payload(payload)
     try:
-        data = base64.b64decode(payload, validate=True)
-        img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        data = _b64decode(payload) if enc == "base64" else payload
+        img = _imdecode(data) if enc != "unknown" else None
         if img is not None:
-            return img, "base64"
+            return img, enc, data
     except Exception:
         pass
 
-    # try raw bytes
+    # unrecognised header: let OpenCV try any other container it supports
     try:
-        img = cv2.imdecode(np.frombuffer(payload, np.uint8), cv2.IMREAD_COLOR)
+        img = _imdecode(payload)
         if img is not None:
-            return img, "raw"
+            return img, "raw", payload
     except Exception:
         pass
 
-    return None, "unknown"
-
-def analyze_and_save(copy_idx, img_bgr, w, h, prefix, unique_id, output_folder):
-    # Copy & prepare
-    result = {
-        "saved": False,
-        "filename": None,
-        "neck_angle": None,
-        "body_angle": None,
-        "posture_status": "Unknown",
-        "landmarks_detected": False
-    }
-    try:
-        image = img_bgr.copy()
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        res = _pose.process(image_rgb)
-        neck_angle = 0
-        body_angle = 0
-        posture_status = "Unknown"
-
-        if res.pose_landmarks:
-            lms = res.pose_landmarks.landmark
-            # required landmarks by index
-            idx = {
-                "left_shoulder": 11, "right_shoulder": 12,
-                "left_hip": 23, "right_hip": 24,
-                "left_ear": 7, "right_ear": 8,
-                "left_knee": 25, "right_knee": 26
-            }
-            required = [idx["left_shoulder"], idx["left_hip"], idx["left_ear"]]
-            vis_ok = True
-            for i in required:
-                try:
-                    if lms[i].visibility < 0.01:
-                        vis_ok = False
-                        break
-                except Exception:
-                    vis_ok = False
-                    break
-
-            # additional criterion: >=20 landmarks with visibility >=0.9
-            high_vis = sum(1 for lm in lms if getattr(lm, "visibility", 0.0) >= 0.9)
-            if vis_ok and high_vis >= 20:
-                _mp_drawing.draw_landmarks(
-                    image,
-                    res.pose_landmarks,
-                    _mp_pose.POSE_CONNECTIONS,
-                    landmark_drawing_spec=_mp_styles.get_default_pose_landmarks_style()
-                )
+    return None, "unknown", None
 
-                def _pix(lm):
-                    return int(lm.x * w), int(lm.y * h)
+_REDUCED_FLAGS = {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
 
-                ls = lms[idx["left_shoulder"]]
-                le = lms[idx["left_ear"]]
-                lh = lms[idx["left_hip"]]
-
-                lsx, lsy = _pix(ls)
-                lex, ley = _pix(le)
-                lhx, lhy = _pix(lh)
+def prepare_inference(img, data=None, scale=None, method=None):
+    """
+    RGB frame for Pose.process at 1/scale resolution. With method "dct" and the
+    original JPEG bytes, libjpeg decodes straight to the reduced size; otherwise
+    the full BGR frame is shrunk with INTER_AREA. Scale 1 only converts colors.
+    """
+    scale = INFER_SCALE if scale is None else scale
+    method = INFER_SCALE_METHOD if method is None else method
+    small = None
+    if scale > 1:
+        if method == "dct" and scale in _REDUCED_FLAGS and data is not None and sniff_payload(data) == "jpeg":
+            small = _imdecode(data, _REDUCED_FLAGS[scale])
+        if small is None:
+            h, w = img.shape[:2]
+            small = cv2.resize(img, (max(1, w // scale), max(1, h // scale)), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(img if small is None else small, cv2.COLOR_BGR2RGB)
 
-                neck_angle = findAngle(lsx, lsy, lex, ley)
-                body_angle = findAngle(lhx, lhy, lsx, lsy)
+def decode_image(payload: bytes):
+    img, enc, _ = decode_frame(payload)
+    return img, enc
 
-                posture_status = "Good" if (10 < neck_angle < 50 and body_angle < 20) else "Bad"
+def _estimate_pose(image_bgr, w, h, timings=None, complexity=None, image_rgb=None, session=None):
+    """
+    Run Pose on one frame; returns a picklable record (also what the cache stores).
+    image_rgb is the (possibly reduced) inference frame; landmarks are normalized,
+    so they are mapped onto the original w x h for the angles. With a session
+    (pi_id) the Pi's tracking Pose is used instead of the static one.
+    """
+    t0 = time.perf_counter()
+    if image_rgb is None:
+        image_rgb = prepare_inference(image_bgr)
+    complexity = MODEL_COMPLEXITY if complexity is None else complexity
+    pose_model = _session_pose(session, complexity) if session is not None else _get_pose(complexity)
+    res = pose_model.process(image_rgb)
+    t1 = time.perf_counter()
+    pose = _landmark_record(res, w, h)
+    if timings is not None:
+        timings["pose_process"] = t1 - t0
+        timings["landmarks"] = time.perf_counter() - t1
+    return pose
+
+def _landmark_record(res, w, h):
+    pose = {
+        "landmarks": None,
+        "neck_angle": 0,
+        "body_angle": 0,
+        "posture_status": PostureStatus.UNKNOWN,
+        "landmarks_detected": False
+    }
 
-                cv2.putText(image, f"Neck Angle: {neck_angle} deg", (10, 30), font, 1, colors["light_blue"], 2)
-                cv2.putText(image, f"Body Angle: {body_angle} deg", (10, 70), font, 1, colors["light_green"], 2)
+    if not res.pose_landmarks:
+        pose["posture_status"] = PostureStatus.NO_LANDMARKS
+        return pose
+
+    rows = landmark_rows(res.pose_landmarks)
+    detected, neck, body, status = score_frame(rows, w, h)
+    pose["landmarks"] = np.array(rows, dtype=np.float32)
+    pose["posture_status"] = status
+    if detected:
+        pose.update({"neck_angle": neck, "body_angle": body, "landmarks_detected": True})
+    return pose
+
+def _needs_annotation(pose):
+    return pose["landmarks_detected"] or ANNOTATE_MISSES
+
+def _annotate(image, pose):
+    """Draw landmarks and angle/status text for a pose record onto image (in place)."""
+    status = pose["posture_status"]
+    if pose["landmarks_detected"]:
+        from mediapipe.framework.formats import landmark_pb2
+        lm_list = landmark_pb2.NormalizedLandmarkList()
+        for x, y, z, v in np.asarray(pose["landmarks"]).tolist():
+            lm_list.landmark.add(x=x, y=y, z=z, visibility=v)
+        _mp_drawing.draw_landmarks(
+            image,
+            lm_list,
+            _mp_pose.POSE_CONNECTIONS,
+            landmark_drawing_spec=_mp_styles.get_default_pose_landmarks_style()
+        )
+        cv2.putText(image, f"Neck Angle: {pose['neck_angle']} deg", (10, 30), font, 1, colors["light_blue"], 2)
+        cv2.putText(image, f"Body Angle: {pose['body_angle']} deg", (10, 70), font, 1, colors["light_green"], 2)
+        if status == PostureStatus.BAD:
+            cv2.putText(image, "Bad_Posture", (10, 110), font, 1, colors["pink"], 2)
+    elif status == PostureStatus.INSUFFICIENT_LANDMARKS:
+        cv2.putText(image, "Insufficient landmarks/visibility", (10, 30), font, 1, colors["yellow"], 2)
+    else:
+        cv2.putText(image, "No pose landmarks detected", (10, 30), font, 1, colors["yellow"], 2)
 
-                if posture_status == "Bad":
-                    cv2.putText(image, "Bad_Posture", (10, 110), font, 1, colors["pink"], 2)
-                result["landmarks_detected"] = True
-            else:
-                cv2.putText(image, "Insufficient landmarks/visibility", (10, 30), font, 1, colors["yellow"], 2)
-                posture_status = "Insufficient_Landmarks"
-        else:
-            cv2.putText(image, "No pose landmarks detected", (10, 30), font, 1, colors["yellow"], 2)
-            posture_status = "No_Landmarks"
+class Result:
+    """
+    One analyzed copy, as sent from a worker to the parent. Slots instead of a dict,
+    and pickled as a flat tuple (status as a small int) via __reduce__.
+    - stages: seconds per WORKER_STAGES entry, None where a stage didn't run
+    - writer: (stats snapshot, write durations) only on stream-mode tasks; benchmark
+      loops get one report per worker from the end-of-loop flush instead
+    """
+    __slots__ = ("saved", "filename", "neck_angle", "body_angle", "status", "landmarks_detected",
+                 "worker_seconds", "model_complexity", "writer", "stages")
+
+    def __init__(self, saved=False, filename=None, neck_angle=None, body_angle=None, status=0,
+                 landmarks_detected=False, worker_seconds=None, model_complexity=None, writer=None, stages=None):
+        self.saved = saved
+        self.filename = filename
+        self.neck_angle = neck_angle
+        self.body_angle = body_angle
+        self.status = status
+        self.landmarks_detected = landmarks_detected
+        self.worker_seconds = worker_seconds
+        self.model_complexity = model_complexity
+        self.writer = writer
+        self.stages = stages
+
+    def __reduce__(self):
+        return (Result, tuple(getattr(self, f) for f in self.__slots__))
+
+    @property
+    def posture_status(self):
+        return PostureStatus(self.status).label
+
+def analyze_and_save(copy_idx, frame, w, h, prefix, unique_id, output_folder, frame_key=None,
+                     complexity=None, session=None, report_writer=False):
+    # Copy & prepare (frame is an ndarray or a SharedFrame descriptor)
+    t0 = time.perf_counter()
+    complexity = MODEL_COMPLEXITY if complexity is None else complexity
+    result = Result(model_complexity=complexity)
+    timings = {}
+    try:
+        src = _resolve_frame(frame)
+
+        # identical frames cost a cache lookup instead of an inference
+        # (not with tracking: a tracked result depends on the Pi's previous frames)
+        use_cache = _pose_cache is not None and frame_key is not None and session is None
+        cache_key = f"{frame_key}:{complexity}" if use_cache else None
+        pose = _pose_cache.get(cache_key) if use_cache else None
+        if pose is None:
+            pose = _estimate_pose(src, w, h, timings, complexity, _resolve_infer(frame), session)
+            if use_cache:
+                _pose_cache.put(cache_key, pose)
 
         fname = f"{prefix}_{unique_id}_{copy_idx + 1}.jpg"
-        fpath = os.path.join(output_folder, fname)
-        ok = cv2.imwrite(fpath, image)
-
-        result.update({
-            "saved": bool(ok),
-            "filename": fname if ok else None,
-            "neck_angle": neck_angle,
-            "body_angle": body_angle,
-            "posture_status": posture_status
-        })
+        token = frame if isinstance(frame, tuple) else frame_key
+        if WRITER_SKIP_IDENTICAL and token is not None and token in _written:
+            ok, fname = True, _written[token]
+        else:
+            fpath = os.path.join(output_folder, fname)
+            jpeg = None if _needs_annotation(pose) else _resolve_jpeg(frame)
+            image = None
+            if jpeg is None:
+                image = src.copy()
+                if _needs_annotation(pose):
+                    t_draw = time.perf_counter()
+                    _annotate(image, pose)
+                    timings["draw"] = time.perf_counter() - t_draw
+            t_write = time.perf_counter()
+            if _writer is not None:
+                _writer.submit(fpath, image, jpeg)
+                ok = None  # pending until the worker's writer is flushed
+            elif jpeg is not None:
+                with open(fpath, "wb") as f:
+                    f.write(jpeg)
+                ok = True
+            else:
+                ok = cv2.imwrite(fpath, image, [int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY])
+            if _writer is None:
+                timings["imwrite"] = time.perf_counter() - t_write
+            if ok is not False and WRITER_SKIP_IDENTICAL and token is not None:
+                _written[token] = fname
+                while len(_written) > _MAX_ATTACHED:
+                    _written.popitem(last=False)
+
+        # saved is None while a background write is pending; the filename is kept for it
+        result.saved = None if ok is None else bool(ok)
+        result.filename = fname if ok is not False else None
+        result.neck_angle = pose["neck_angle"]
+        result.body_angle = pose["body_angle"]
+        result.status = int(pose["posture_status"])
+        result.landmarks_detected = pose["landmarks_detected"]
     except Exception as e:
         # keep result fields as default; log
         LOGGER.exception("analyze_and_save error: %s", e)
+    result.worker_seconds = time.perf_counter() - t0
+    if report_writer:
+        result.writer = _writer_report()
+    result.stages = tuple(timings.get(stage) for stage in WORKER_STAGES)
     return result
 
+# ---------------------------
+# Dispatch (copy fan-out)
+# ---------------------------
+def analyze_chunk(loop_token, start, stop, frame, w, h, prefix, unique_id, output_folder, frame_key=None):
+    """Worker task: analyze copies [start, stop) and stream each result to the parent."""
+    for i in range(start, stop):
+        result = analyze_and_save(i, frame, w, h, prefix, unique_id, output_folder, frame_key)
+        _result_q.put((loop_token, start, result))
+    return stop - start
+
+def _noop():
+    return None
+
+class ChunkTuner:
+    """
+    Picks the chunk size for DISPATCH_MODE=chunked.
+    - overhead: parent-side cost per future under load (submit, pickling, executor
+      bookkeeping and completion handling), from a burst of empty tasks on the live pool
+    - per-copy cost: mean worker_seconds of the previous loop
+    A chunk is made just large enough that one task's overhead stays under
+    CHUNK_OVERHEAD_PCT of its compute, but at least `minimum` copies, and capped
+    so every worker still gets work.
+    """
+    def __init__(self, fixed=None, overhead_pct=1.0, workers=1, minimum=1):
+        self.fixed = fixed
+        self.overhead_pct = overhead_pct
+        self.workers = max(1, workers)
+        self.minimum = max(1, minimum)
+        self.task_overhead_s = None
+        self.per_copy_s = None
+
+    def measure_overhead(self, pool, rounds=3, per_worker=20):
+        pool.submit(_noop).result()  # first call may include worker start-up
+        burst = self.workers * per_worker
+        times = []
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            futures = [pool.submit(_noop) for _ in range(burst)]
+            for f in as_completed(futures):
+                f.result()
+            times.append((time.perf_counter() - t0) / burst)
+        times.sort()
+        self.task_overhead_s = times[len(times) // 2]
+        LOGGER.info("⏱️ Per-task dispatch overhead: %.3f ms (burst of %d futures)",
+                    self.task_overhead_s * 1000.0, burst)
+
+    def observe(self, worker_seconds):
+        vals = [v for v in worker_seconds if v]
+        if vals:
+            self.per_copy_s = sum(vals) / len(vals)
+
+    def chunk_size(self, copies):
+        balanced = max(1, -(-copies // self.workers))  # ceil: one chunk per worker
+        if self.fixed:
+            return min(self.fixed, balanced)
+        if not self.task_overhead_s or not self.per_copy_s:
+            # nothing measured yet: a few chunks per worker for load balance
+            return min(balanced, max(self.minimum, -(-copies // (self.workers * 4))))
+        needed = self.task_overhead_s / (self.per_copy_s * self.overhead_pct / 100.0)
+        return max(1, min(balanced, max(self.minimum, int(m.ceil(needed)))))
+
+class ComplexityController:
+    """
+    Adaptive model choice for stream mode (ADAPTIVE_COMPLEXITY=true).
+    - per model: rolling p95 of worker_seconds over the last ADAPTIVE_WINDOW frames
+    - predicted latency of the next frame: p95 x (1 + backlog / workers)
+    - over the SLO: drop to the heaviest lighter model that fits (else one step down)
+    - step up only with headroom (predicted <= SLO x headroom); an unmeasured
+      heavier model is probed one level at a time
+    """
+    LEVELS = (0, 1, 2)
+
+    def __init__(self, slo_s, workers, window=50, start=2, headroom=0.8):
+        self.slo_s = slo_s
+        self.workers = max(1, workers)
+        self.headroom = headroom
+        self.service = {c: deque(maxlen=max(1, window)) for c in self.LEVELS}
+        self.current = min(max(start, self.LEVELS[0]), self.LEVELS[-1])
+
+    def observe(self, complexity, worker_seconds):
+        if complexity in self.service and worker_seconds:
+            self.service[complexity].append(worker_seconds)
+
+    def p95(self, complexity):
+        vals = self.service[complexity]
+        return float(np.percentile(np.asarray(vals), 95)) if vals else None
+
+    def choose(self, backlog):
+        load = 1.0 + max(0, backlog) / self.workers
+        pred = {}
+        for c in self.LEVELS:
+            p = self.p95(c)
+            pred[c] = p * load if p is not None else None
+        cur = self.current
+        if pred[cur] is not None and pred[cur] > self.slo_s:
+            lighter = [c for c in self.LEVELS if c < cur and pred[c] is not None and pred[c] <= self.slo_s]
+            new = max(lighter) if lighter else max(self.LEVELS[0], cur - 1)
+        else:
+            fits = self.slo_s * self.headroom
+            heavier = [c for c in self.LEVELS if c > cur and pred[c] is not None and pred[c] <= fits]
+            if heavier:
+                new = max(heavier)
+            elif cur < self.LEVELS[-1] and pred[cur + 1] is None and pred[cur] is not None and pred[cur] <= fits:
+                new = cur + 1
+            else:
+                new = cur
+        if new != cur:
+            LOGGER.info("🎚️ Model complexity %d -> %d (predicted %s s vs SLO %.3f s, backlog=%d)",
+                        cur, new, round(pred[cur], 3) if pred[cur] is not None else None, self.slo_s, backlog)
+            self.current = new
+        if METRICS is not None:
+            METRICS.model.set(self.current)
+        return self.current
+
+def _iter_futures(futures):
+    """Yield (result, submit time) as the per-copy futures ({future: submit time}) complete."""
+    for f in as_completed(futures):
+        try:
+            yield f.result(), futures[f]
+        except Exception as e:
+            LOGGER.error("Worker task failed: %s", e)
+
+def _iter_streamed(futures, result_q, loop_token, expected, submitted, grace_s=5.0):
+    """
+    Yield (result, submit time) from result_q until `expected` arrive or the chunks are done.
+    Copies in a chunk run back to back, so a copy's submit time is its chunk's
+    (`submitted[start]`) plus the worker time of the copies before it in that chunk.
+    """
+    received = 0
+    deadline = None
+    while received < expected:
+        try:
+            token, start, result = result_q.get(timeout=0.5)
+        except queue.Empty:
+            if deadline is None and all(f.done() for f in futures):
+                failed = [f for f in futures if f.exception() is not None]
+                for f in failed:
+                    LOGGER.error("Worker chunk failed: %s", f.exception())
+                # allow the workers' queue feeder threads to flush
+                deadline = time.monotonic() + grace_s
+            if deadline is not None and time.monotonic() > deadline:
+                LOGGER.error("Loop %s: %d of %d results missing", loop_token, expected - received, expected)
+                break
+            continue
+        if token != loop_token:
+            continue  # leftover from an aborted loop
+        received += 1
+        t_submit = submitted[start]
+        if result.worker_seconds is not None:
+            submitted[start] = t_submit + result.worker_seconds
+        yield result, t_submit
+
+def dispatch_copies(pool, tuner, result_q, loop_token, copies, frame_arg, w, h, pi_id, unique_id,
+                    output_folder, frame_key=None):
+    """Fan `copies` analyses out to the pool; returns an iterator of (result, submit time) per copy."""
+    if DISPATCH_MODE != "chunked" or result_q is None:
+        futures = {}
+        for i in range(copies):
+            t_submit = time.perf_counter()
+            futures[_track(pool.submit(analyze_and_save, i, frame_arg, w, h, pi_id, unique_id,
+                                       output_folder, frame_key))] = t_submit
+        return _iter_futures(futures)
+
+    size = tuner.chunk_size(copies)
+    LOGGER.info("📦 Loop %s: %d copies in chunks of %d", loop_token, copies, size)
+    futures, submitted = [], {}
+    for start in range(0, copies, size):
+        submitted[start] = time.perf_counter()
+        futures.append(_track(pool.submit(analyze_chunk, loop_token, start, min(start + size, copies),
+                                          frame_arg, w, h, pi_id, unique_id, output_folder, frame_key)))
+    return _iter_streamed(futures, result_q, loop_token, copies, submitted)
+
 # ---------------------------
 # MQTT
 # ---------------------------
-message_q: "queue.Queue[tuple[str, np.ndarray, datetime]]" = queue.Queue()
+def pi_id_from_topic(topic):
+    parts = topic.split("/")
+    return parts[1] if len(parts) > 1 else "unknown"
+
+class IngestBuffer:
+    """
+    Bounded per-Pi buffer of raw (topic, payload, received_time) between the MQTT
+    callback and the decode threads. Pis are served round-robin so one fast
+    publisher cannot starve the others; overflow follows INGEST_POLICY.
+    """
+    POLICIES = ("drop_oldest", "keep_latest", "block")
+
+    def __init__(self, capacity=4, policy="drop_oldest", block_timeout_s=30.0):
+        if policy not in self.POLICIES:
+            raise ValueError(f"INGEST_POLICY must be one of {self.POLICIES}, got {policy!r}")
+        self.capacity = 1 if policy == "keep_latest" else max(1, capacity)
+        self.policy = policy
+        self.block_timeout_s = block_timeout_s
+        self._queues = OrderedDict()  # pi_id -> deque, rotated for round-robin
+        self._received = {}
+        self._dropped = {}
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def put(self, topic, payload, received_time):
+        pi_id = pi_id_from_topic(topic)
+        with self._cond:
+            q = self._queues.get(pi_id)
+            if q is None:
+                q = self._queues[pi_id] = deque()
+            self._received[pi_id] = self._received.get(pi_id, 0) + 1
+            if len(q) >= self.capacity and self.policy == "block":
+                self._cond.wait_for(lambda: len(q) < self.capacity or self._closed,
+                                    timeout=self.block_timeout_s)
+                if len(q) >= self.capacity or self._closed:
+                    self._drop(pi_id)
+                    return False
+            while len(q) >= self.capacity:
+                q.popleft()
+                self._size -= 1
+                self._drop(pi_id)
+            q.append((topic, payload, received_time))
+            self._size += 1
+            self._cond.notify_all()
+            return True
+
+    def _drop(self, pi_id):
+        self._dropped[pi_id] = self._dropped.get(pi_id, 0) + 1
+        if METRICS is not None:
+            METRICS.drop(pi_id, self.policy)
+
+    def get(self):
+        """Next payload, round-robin across Pis; None once closed."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._size > 0 or self._closed)
+            if self._closed:
+                return None
+            for pi_id, q in self._queues.items():
+                if q:
+                    self._queues.move_to_end(pi_id)
+                    item = q.popleft()
+                    self._size -= 1
+                    self._cond.notify_all()
+                    return item
+
+    def qsize(self):
+        with self._cond:
+            return self._size
+
+    def dropped_total(self):
+        with self._cond:
+            return sum(self._dropped.values())
+
+    def stats(self):
+        """Per-Pi {received, dropped, queued} counters."""
+        with self._cond:
+            return {pi_id: {"received": self._received.get(pi_id, 0),
+                            "dropped": self._dropped.get(pi_id, 0),
+                            "queued": len(q)}
+                    for pi_id, q in self._queues.items()}
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+# raw payloads from the MQTT thread -> decode threads -> decoded frames for main();
+# the IngestBuffer is built (and INGEST_POLICY checked) by configure()
+ingest = None
+# frame_q items: (topic, BGR image, RGB inference image, received_time, decode_s,
+#                 jpeg bytes or None, perf_counter when decoded)
+frame_q: "queue.Queue[tuple]" = queue.Queue(maxsize=max(1, DECODED_QUEUE_SIZE))
 
 def on_connect(client, userdata, flags, rc):
     if rc == 0:
@@ -298,79 +1700,314 @@ def on_connect(client, userdata, flags, rc):
         LOGGER.error("❌ MQTT connection failed with rc=%s", rc)
 
 def on_message(client, userdata, msg):
-    # push every message; main loop will take exactly one per loop
+    # buffer the raw payload (bounded per Pi); decoding happens on the decode threads
     try:
-        received_time = datetime.now()
-        img, enc = decode_image(msg.payload)
-        if img is None:
-            LOGGER.error("Could not decode image from %s (enc=%s)", msg.topic, enc)
-            return
-        message_q.put((msg.topic, img, received_time))
+        # paho stamps msg.timestamp (time.monotonic) once the PUBLISH has been read off the socket
+        arrived = getattr(msg, "timestamp", 0) or time.monotonic()
+        ingest.put(msg.topic, msg.payload, datetime.now())
+        if METRICS is not None:
+            METRICS.observe("mqtt_receive", time.monotonic() - arrived)
     except Exception as e:
         LOGGER.exception("on_message error: %s", e)
 
+def _decode_loop():
+    while True:
+        item = ingest.get()
+        if item is None:
+            break
+        topic, payload, received_time = item
+        if METRICS is not None:
+            METRICS.observe("ingest_wait", (datetime.now() - received_time).total_seconds())
+        try:
+            t0 = time.perf_counter()
+            img, enc, data = decode_frame(payload)
+            if img is None:
+                LOGGER.error("Could not decode image from %s (enc=%s)", topic, enc)
+                continue
+            # RGB inference frame, prepared once instead of per copy
+            infer = prepare_inference(img, data)
+            decode_s = time.perf_counter() - t0
+            # keep the original JPEG so un-annotated outputs need no re-encode
+            jpeg = bytes(data) if sniff_payload(data) == "jpeg" else None
+            if METRICS is not None:
+                METRICS.observe("decode", decode_s)
+            item = (topic, img, infer, received_time, decode_s, jpeg, time.perf_counter())
+            # bounded wait so a full frame_q cannot hold the thread past shutdown
+            while True:
+                try:
+                    frame_q.put(item, timeout=0.5)
+                    break
+                except queue.Full:
+                    if ingest.closed:
+                        return
+        except Exception as e:
+            LOGGER.exception("decode error: %s", e)
+
+def start_decoders(n: int = DECODE_THREADS):
+    threads = [threading.Thread(target=_decode_loop, name=f"decode-{i}", daemon=True)
+               for i in range(max(1, n))]
+    for t in threads:
+        t.start()
+    return threads
+
+def stop_decoders(threads, timeout_s: float = 2.0):
+    # closing the buffer wakes every decoder blocked in ingest.get()
+    ingest.close()
+    for t in threads or []:
+        t.join(timeout=timeout_s)
+        if t.is_alive():
+            LOGGER.warning("⚠️ Decoder thread %s did not stop within %.1fs", t.name, timeout_s)
+
 
 # ---------------------------
-# Resource Sampler (tegrastats)
+# Resource Sampler (pluggable backends)
 # ---------------------------
-class ResourceSampler:
+# Every backend returns the same sample dict each tick, so CSV figures are
+# comparable across Jetson, x86 and Raspberry Pi nodes:
+#   gpu_pct            Jetson GR3D load (tegrastats only)
+#   cpu_pct, ram_pct   node-wide (cgroup backend: relative to the container's limits)
+#   cpu_cores          per-core busy % list
+#   proc_cpu_pct       this analyzer's process tree (parent + workers), % of all node cores
+#   proc_rss_mb        RSS summed over the process tree
+#   container_cpu_pct  cgroup v2 usage, % of the container's CPU limit (cpu.max or all cores)
+#   container_mem_mb   cgroup v2 memory.current
+SAMPLE_KEYS = ("gpu_pct", "cpu_pct", "ram_pct", "proc_cpu_pct", "proc_rss_mb",
+               "container_cpu_pct", "container_mem_mb")
+
+_CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def _proc_stat_cpus():
+    """[(busy_ticks, total_ticks)] for the aggregate line followed by each core."""
+    text = _read_file("/proc/stat")
+    out = []
+    for line in (text or "").splitlines():
+        if not line.startswith("cpu"):
+            break
+        vals = [int(v) for v in line.split()[1:]]
+        idle = vals[3] + (vals[4] if len(vals) > 4 else 0)  # idle + iowait
+        total = sum(vals[:8])  # guest time is already included in user/nice
+        out.append((total - idle, total))
+    return out
+
+def _proc_meminfo_pct():
+    text = _read_file("/proc/meminfo")
+    if not text:
+        return None
+    info = {}
+    for line in text.splitlines():
+        key, _, rest = line.partition(":")
+        info[key] = int(rest.split()[0])
+    total = info.get("MemTotal")
+    avail = info.get("MemAvailable", info.get("MemFree"))
+    return round((total - avail) / total * 100.0, 3) if total and avail is not None else None
+
+def smaps_rollup_mb(pid):
+    """{rss, pss, shared, private} in MB from /proc/<pid>/smaps_rollup, or None (gone / kernel < 4.14)."""
+    text = _read_file(f"/proc/{pid}/smaps_rollup")
+    if not text:
+        return None
+    kb = {}
+    for line in text.splitlines()[1:]:
+        key, _, rest = line.partition(":")
+        if rest.strip().endswith("kB"):
+            kb[key] = int(rest.split()[0])
+    return {"rss": kb.get("Rss", 0) / 1024.0, "pss": kb.get("Pss", 0) / 1024.0,
+            "shared": (kb.get("Shared_Clean", 0) + kb.get("Shared_Dirty", 0)) / 1024.0,
+            "private": (kb.get("Private_Clean", 0) + kb.get("Private_Dirty", 0)) / 1024.0}
+
+def _proc_tree_usage(root_pid):
+    """(cpu seconds, rss bytes) summed over root_pid and all its descendants."""
+    children = {}
+    stats = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        text = _read_file(f"/proc/{entry}/stat")
+        if not text:
+            continue
+        # comm may contain spaces; fields after the closing paren are fixed
+        fields = text[text.rfind(")") + 2:].split()
+        pid = int(entry)
+        children.setdefault(int(fields[1]), []).append(pid)
+        stats[pid] = (int(fields[11]) + int(fields[12]), int(fields[21]))  # utime+stime, rss pages
+    cpu_ticks = rss_pages = 0
+    todo = [root_pid]
+    while todo:
+        pid = todo.pop()
+        ticks, pages = stats.get(pid, (0, 0))
+        cpu_ticks += ticks
+        rss_pages += pages
+        todo.extend(children.get(pid, ()))
+    return cpu_ticks / _CLK_TCK, rss_pages * _PAGE_SIZE
+
+def _cgroup_usage(cg_dir):
+    """(cpu seconds, memory bytes or None, memory limit bytes or None)."""
+    cpu_s = None
+    for line in (_read_file(os.path.join(cg_dir, "cpu.stat")) or "").splitlines():
+        if line.startswith("usage_usec"):
+            cpu_s = int(line.split()[1]) / 1e6
+    mem = _read_file(os.path.join(cg_dir, "memory.current"))
+    limit = (_read_file(os.path.join(cg_dir, "memory.max")) or "max").strip()
+    return cpu_s, int(mem) if mem else None, int(limit) if limit.isdigit() else None
+
+class SamplerBackend:
+    """
+    /proc/stat + /proc/meminfo for node figures; every backend also reports the
+    process tree (from /proc/<pid>/stat) and the container (cgroup v2) figures.
+    Subclasses override node() or tree(). read() is called once per interval.
+    """
+    name = "proc"
+
+    def __init__(self, root_pid=None):
+        self.root_pid = root_pid or os.getpid()
+        self.cores = os.cpu_count() or 1
+        self.cg_dir = _cgroup_dir()
+        self.cg_cpus = _cgroup_cpu_limit(self.cg_dir) if self.cg_dir else None
+        self._prev = {}
+
+    def start(self):
+        self.read()  # prime the counters so the first real sample has a delta
+        return self
+
+    def close(self):
+        pass
+
+    def _rate(self, key, value, now):
+        """Seconds-of-CPU per wall second since the previous call for `key`."""
+        prev = self._prev.get(key)
+        self._prev[key] = (value, now)
+        if prev is None or value is None or now <= prev[1]:
+            return None
+        return (value - prev[0]) / (now - prev[1])
+
+    def node(self):
+        cpus = _proc_stat_cpus()
+        prev = self._prev.get("stat")
+        self._prev["stat"] = cpus
+        if not prev or len(prev) != len(cpus):
+            return {"ram_pct": _proc_meminfo_pct()}
+        pct = [round((b - pb) / (t - pt) * 100.0, 3) if t > pt else 0.0
+               for (b, t), (pb, pt) in zip(cpus, prev)]
+        return {"cpu_pct": pct[0], "cpu_cores": pct[1:], "ram_pct": _proc_meminfo_pct()}
+
+    def tree(self, now):
+        cpu_s, rss = _proc_tree_usage(self.root_pid)
+        rate = self._rate("tree", cpu_s, now)
+        return {
+            "proc_cpu_pct": round(rate / self.cores * 100.0, 3) if rate is not None else None,
+            "proc_rss_mb": round(rss / 1e6, 3),
+        }
+
+    def container(self, now):
+        if self.cg_dir is None:
+            return {}
+        cpu_s, mem, _ = _cgroup_usage(self.cg_dir)
+        rate = self._rate("cgroup", cpu_s, now)
+        return {
+            "container_cpu_pct": round(rate / self.cg_cpus * 100.0, 3) if rate is not None else None,
+            "container_mem_mb": round(mem / 1e6, 3) if mem is not None else None,
+        }
+
+    def read(self):
+        now = time.monotonic()
+        sample = {}
+        for part in (self.node, lambda: self.tree(now), lambda: self.container(now)):
+            try:
+                sample.update(part())
+            except Exception as e:
+                LOGGER.debug("%s sampler: %s", self.name, e)
+        return sample
+
+class CgroupSamplerBackend(SamplerBackend):
+    """cpu_pct/ram_pct relative to the container's cgroup v2 limits (per-core still from /proc/stat)."""
+    name = "cgroup"
+
+    def node(self):
+        sample = super().node()
+        if self.cg_dir is None:
+            return sample
+        cpu_s, mem, limit = _cgroup_usage(self.cg_dir)
+        rate = self._rate("cgroup_node", cpu_s, time.monotonic())
+        sample["cpu_pct"] = round(rate / self.cg_cpus * 100.0, 3) if rate is not None else None
+        if mem is not None and limit:
+            sample["ram_pct"] = round(mem / limit * 100.0, 3)
+        return sample
+
+class PsutilSamplerBackend(SamplerBackend):
+    """Node and process-tree figures from psutil."""
+    name = "psutil"
+
+    def __init__(self, root_pid=None):
+        super().__init__(root_pid)
+        import psutil
+        self.psutil = psutil
+        self.root = psutil.Process(self.root_pid)
+        self._procs = {}  # pid -> Process, so cpu_percent() has a baseline per process
+
+    def node(self):
+        cores = self.psutil.cpu_percent(percpu=True)
+        return {
+            "cpu_pct": round(sum(cores) / len(cores), 3) if cores else None,
+            "cpu_cores": cores,
+            "ram_pct": self.psutil.virtual_memory().percent,
+        }
+
+    def tree(self, now):
+        procs = [self.root] + self.root.children(recursive=True)
+        cpu = rss = 0.0
+        live = {}
+        for p in procs:
+            p = self._procs.get(p.pid, p)
+            try:
+                cpu += p.cpu_percent(None)
+                rss += p.memory_info().rss
+                live[p.pid] = p
+            except self.psutil.Error:
+                pass
+        self._procs = live
+        return {"proc_cpu_pct": round(cpu / self.cores, 3), "proc_rss_mb": round(rss / 1e6, 3)}
+
+class TegrastatsSamplerBackend(SamplerBackend):
     """
-    Samples GPU/CPU/RAM% from `tegrastats` while running.
+    Node figures from a `tegrastats` subprocess (Jetson); read() returns the latest line.
     - GPU:  GR3D_FREQ X%
-    - CPU:  average of all core samples like '5%@', '12%@', ...
+    - CPU:  per-core samples like '5%@', '12%@', ... and their average
     - RAM:  RAM used/totalMB|MiB|GB|GiB -> used/total * 100
     """
-    def __init__(self, interval_ms: int = 200):
+    name = "tegrastats"
+
+    def __init__(self, root_pid=None, interval_ms=200):
+        super().__init__(root_pid)
         self.interval_ms = interval_ms
         self.proc = None
         self.thread = None
-        self.stop_event = threading.Event()
-        self._gpu = []
-        self._cpu = []
-        self._ram = []
-
-        # compiled regexes for speed
+        self.latest = {}
         self.re_gpu = re.compile(r"GR3D_FREQ\s+(\d+)%")
         self.re_cpu_all = re.compile(r"(\d+)%@")
-        # RAM used/total with units MB/MiB/GB/GiB; we normalize to percent
+        # RAM used/total with units MB/MiB/GB/GiB; same unit on both sides, so the ratio is unit-free
         self.re_ram = re.compile(r"RAM\s+(\d+(?:\.\d+)?)/(\d+(?:\.\d+)?)(?:\s*)([MG]i?B)")
 
+    def _parse(self, line):
+        sample = {}
+        m_gpu = self.re_gpu.search(line)
+        if m_gpu:
+            sample["gpu_pct"] = float(m_gpu.group(1))
+        cores = [float(v) for v in self.re_cpu_all.findall(line)]
+        if cores:
+            sample["cpu_pct"] = sum(cores) / len(cores)
+            sample["cpu_cores"] = cores
+        m_ram = self.re_ram.search(line)
+        if m_ram and float(m_ram.group(2)) > 0:
+            sample["ram_pct"] = float(m_ram.group(1)) / float(m_ram.group(2)) * 100.0
+        return sample
+
     def _reader(self, pipe):
         try:
             for raw in iter(pipe.readline, ''):
-                if self.stop_event.is_set():
-                    break
-                line = raw.strip()
-
-                # GPU %
-                m_gpu = self.re_gpu.search(line)
-                if m_gpu:
-                    try:
-                        self._gpu.append(float(m_gpu.group(1)))
-                    except Exception:
-                        pass
-
-                # CPU % (avg across all cores present in the line)
-                cpu_matches = self.re_cpu_all.findall(line)
-                if cpu_matches:
-                    try:
-                        core_vals = [float(v) for v in cpu_matches]
-                        if core_vals:
-                            self._cpu.append(sum(core_vals) / len(core_vals))
-                    except Exception:
-                        pass
-
-                # RAM % (used/total * 100)
-                m_ram = self.re_ram.search(line)
-                if m_ram:
-                    try:
-                        used = float(m_ram.group(1))
-                        total = float(m_ram.group(2))
-                        # unit = m_ram.group(3).lower()  # ratio independent of unit (tegrastats uses same unit)
-                        if total > 0:
-                            self._ram.append((used / total) * 100.0)
-                    except Exception:
-                        pass
+                sample = self._parse(raw.strip())
+                if sample:
+                    self.latest = sample
         finally:
             try:
                 pipe.close()
@@ -378,69 +2015,806 @@ class ResourceSampler:
                 pass
 
     def start(self):
-        try:
-            self.proc = subprocess.Popen(
-                ["tegrastats", "--interval", str(self.interval_ms)],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
-            )
-        except FileNotFoundError:
-            # tegrastats not present – operate as a no-op sampler
-            self.proc = None
-            LOGGER.warning("tegrastats not found; resource sampling disabled for this run.")
-            return self
-
+        self.proc = subprocess.Popen(
+            ["tegrastats", "--interval", str(self.interval_ms)],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+        )
         self.thread = threading.Thread(target=self._reader, args=(self.proc.stdout,), daemon=True)
         self.thread.start()
-        return self
+        return super().start()
 
-    def stop_and_summary(self):
-        # stop the reader
-        self.stop_event.set()
+    def node(self):
+        return dict(self.latest)
+
+    def close(self):
         if self.proc:
             try:
                 self.proc.terminate()
-            except Exception:
-                pass
-        if self.thread:
-            try:
-                self.thread.join(timeout=1.5)
-            except Exception:
-                pass
-        if self.proc:
-            try:
                 self.proc.wait(timeout=1.5)
             except Exception:
                 pass
+        if self.thread:
+            self.thread.join(timeout=1.5)
 
-        def _avg(vals):
-            return round(sum(vals) / len(vals), 6) if vals else None
+SAMPLER_BACKENDS = {
+    "tegrastats": TegrastatsSamplerBackend,
+    "proc": SamplerBackend,
+    "cgroup": CgroupSamplerBackend,
+    "psutil": PsutilSamplerBackend,
+}
 
-        return {
-            "avg_gpu_pct": _avg(self._gpu),
-            "avg_cpu_pct": _avg(self._cpu),
-            "avg_ram_pct": _avg(self._ram),
-        }
+def make_sampler_backend(name="auto", interval_ms=200):
+    """Build and start a backend; "auto" prefers tegrastats, then psutil, then /proc."""
+    if name == "none":
+        return None
+    if name == "auto":
+        candidates = ["tegrastats", "psutil", "proc"]
+    elif name in SAMPLER_BACKENDS:
+        candidates = [name]
+    else:
+        raise ValueError(f"SAMPLER_BACKEND must be auto, none or one of {sorted(SAMPLER_BACKENDS)}, got {name!r}")
+    for cand in candidates:
+        try:
+            cls = SAMPLER_BACKENDS[cand]
+            backend = cls(interval_ms=interval_ms) if cls is TegrastatsSamplerBackend else cls()
+            return backend.start()
+        except (FileNotFoundError, ImportError, OSError) as e:
+            LOGGER.debug("sampler backend %s unavailable: %s", cand, e)
+    LOGGER.warning("No resource sampler backend available (%s); resource sampling disabled for this run.", name)
+    return None
+
+class SampleRing:
+    """
+    Fixed-size float64 ring of timestamped samples (one row per tick, NaN = not reported).
+    Memory is allocated once; after `capacity` ticks the oldest rows are overwritten.
+    """
+    def __init__(self, capacity, width):
+        self.buf = np.full((max(1, capacity), width), np.nan)
+        self.t = np.zeros(len(self.buf))  # time.monotonic() of each row
+        self.n = 0  # rows ever appended
+
+    def append(self, t, row):
+        i = self.n % len(self.buf)
+        self.buf[i] = row
+        self.t[i] = t
+        self.n += 1
+
+    def last_t(self):
+        return self.t[(self.n - 1) % len(self.t)] if self.n else None
+
+    def rows(self, since=0):
+        """(times, rows) retained, oldest first, skipping the first `since` rows ever appended (copies)."""
+        n, cap = self.n, len(self.buf)
+        first = max(since, n - cap)
+        idx = np.arange(first, n) % cap
+        return self.t[idx], self.buf[idx]
+
+def summarize_columns(rows, names):
+    """{name: {min, p50, p95, max, mean}} per column, ignoring NaNs (None if never reported)."""
+    out = {}
+    for j, name in enumerate(names):
+        col = rows[:, j]
+        col = col[~np.isnan(col)]
+        if col.size == 0:
+            out[name] = None
+            continue
+        p50, p95 = np.percentile(col, (50, 95))
+        out[name] = {"min": round(float(col.min()), 6), "p50": round(float(p50), 6),
+                     "p95": round(float(p95), 6), "max": round(float(col.max()), 6),
+                     "mean": round(float(col.mean()), 6)}
+    return out
+
+class ResourceSampler:
+    """
+    One sampler for the whole run: polls a backend (SAMPLER_BACKEND) every interval_ms
+    into timestamped ring buffers (SAMPLER_RING_SIZE ticks).
+    - mark(label): records a marker (e.g. loop start/end) and returns its timestamp
+    - summary(t0, t1): min/p50/p95/max/mean per figure over the ticks covering [t0, t1]
+    - export_timeline(path): appends ticks and markers recorded since the last export
+    """
+    def __init__(self, interval_ms: int = 200, backend: str = None, capacity: int = None):
+        self.interval_ms = interval_ms
+        self.backend_name = backend or SAMPLER_BACKEND
+        self.backend = None
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        capacity = capacity or SAMPLER_RING_SIZE
+        self._series = SampleRing(capacity, len(SAMPLE_KEYS))
+        self._cores = SampleRing(capacity, os.cpu_count() or 1)
+        self.markers = []  # (monotonic time, label)
+        self._exported = 0
+        self._exported_markers = 0
+        self._wall_offset = time.time() - time.monotonic()
+
+    def _poll(self):
+        row = np.empty(len(SAMPLE_KEYS))
+        cores = np.empty(self._cores.buf.shape[1])
+        while not self.stop_event.wait(self.interval_ms / 1000.0):
+            sample = self.backend.read()
+            now = time.monotonic()
+            for j, k in enumerate(SAMPLE_KEYS):
+                v = sample.get(k)
+                row[j] = np.nan if v is None else v
+            per_core = sample.get("cpu_cores") or ()
+            cores.fill(np.nan)
+            n = min(len(per_core), len(cores))
+            cores[:n] = per_core[:n]
+            with self.lock:
+                self._series.append(now, row)
+                self._cores.append(now, cores)
+
+    def start(self):
+        self.backend = make_sampler_backend(self.backend_name, self.interval_ms)
+        if self.backend is not None:
+            self.thread = threading.Thread(target=self._poll, name="sampler", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        # stop the poller, then the backend
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=1.5)
+        if self.backend:
+            self.backend.close()
+
+    def mark(self, label):
+        t = time.monotonic()
+        with self.lock:
+            self.markers.append((t, label))
+        return t
+
+    def summary(self, t0=None, t1=None):
+        """
+        Stats over the ticks covering [t0, t1] (whole retained timeline by default).
+        Each tick describes the interval since the previous one, so the slice runs from
+        the first tick after t0 through the first tick at or after t1; waits up to two
+        intervals for that closing tick.
+        """
+        if t1 is not None and self.thread is not None:
+            deadline = time.monotonic() + 2 * self.interval_ms / 1000.0
+            while (self._series.last_t() or 0.0) < t1 and time.monotonic() < deadline:
+                time.sleep(self.interval_ms / 4000.0)
+        with self.lock:
+            t, rows = self._series.rows()
+            _, cores = self._cores.rows()
+        i0 = np.searchsorted(t, t0, side="right") if t0 is not None else 0
+        i1 = np.searchsorted(t, t1, side="left") + 1 if t1 is not None else len(t)
+        rows, cores = rows[i0:i1], cores[i0:i1]
+
+        summary = {}
+        for k, st in summarize_columns(rows, SAMPLE_KEYS).items():
+            summary[f"avg_{k}"] = st["mean"] if st else None
+            for stat in ("min", "p50", "p95", "max"):
+                summary[f"{k}_{stat}"] = st[stat] if st else None
+        per_core = summarize_columns(cores, range(cores.shape[1]))
+        summary["avg_cpu_core_pct"] = ";".join(
+            f"{st['mean']:.1f}" for st in per_core.values() if st) or None
+        summary["sampler_backend"] = self.backend.name if self.backend else None
+        return summary
+
+    def stop_and_summary(self):
+        self.stop()
+        return self.summary()
+
+    def export_timeline(self, path):
+        """Append ticks/markers recorded since the last export as CSV rows (wall-clock epoch seconds)."""
+        with self.lock:
+            n = self._series.n
+            lost = max(0, n - len(self._series.t) - self._exported)
+            t, rows = self._series.rows(since=self._exported)
+            _, cores = self._cores.rows(since=self._exported)
+            markers = self.markers[self._exported_markers:]
+            self._exported, self._exported_markers = n, len(self.markers)
+        if lost:
+            LOGGER.warning("Sampler timeline: %d ticks were overwritten before export (raise SAMPLER_RING_SIZE)", lost)
+        new_file = not os.path.exists(path)
+        entries = [(float(ti), "", row, core) for ti, row, core in zip(t, rows, cores)]
+        entries += [(ti, label, None, None) for ti, label in markers]
+        entries.sort(key=lambda e: e[0])
+        with open(path, "a", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            if new_file:
+                w.writerow(["time", "marker"] + list(SAMPLE_KEYS) + ["cpu_core_pct"])
+            for ti, label, row, core in entries:
+                vals = [] if row is None else ["" if np.isnan(v) else round(float(v), 3) for v in row]
+                cores_s = "" if core is None else ";".join(f"{v:.1f}" for v in core if not np.isnan(v))
+                w.writerow([round(ti + self._wall_offset, 3), label] + (vals or [""] * len(SAMPLE_KEYS)) + [cores_s])
 
 # ---------------------------
 # Main
 # ---------------------------
-def write_csv(rows):
-    import csv
-    headers = ["loop_index", "copies_in_loop", "processed_count", "avg_process_time_seconds",
-               "pi_id", "loop_received_time", "avg_gpu_pct", "avg_cpu_pct", "avg_ram_pct"]
-    with open(CSV_PATH, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(headers)
-        w.writerows(rows)
+# spread of the main resource figures within a loop (the avg_* columns are the means)
+SAMPLER_SPREAD_COLUMNS = [f"{k}_{stat}" for k in ("cpu_pct", "ram_pct", "gpu_pct", "proc_cpu_pct")
+                          for stat in ("min", "p50", "p95", "max")]
+
+CSV_HEADERS = ["loop_index", "copies_in_loop", "processed_count", "avg_process_time_seconds",
+               "pi_id", "loop_received_time", "avg_gpu_pct", "avg_cpu_pct", "avg_ram_pct",
+               "cache_hits", "cache_misses", "decode_time_seconds",
+               "writer_files", "writer_mb_per_s", "writer_queue_max", "writer_failed", "ingest_dropped",
+               "avg_proc_cpu_pct", "avg_proc_rss_mb", "avg_container_cpu_pct", "avg_container_mem_mb",
+               "avg_cpu_core_pct", "sampler_backend"] + SAMPLER_SPREAD_COLUMNS + ["model_complexity", "workers_pss_mb"]
+
+def _resume_path():
+    return os.environ.get("RESUME_PATH") or CSV_PATH + ".resume.json"
+
+def load_resume_marker():
+    """Last completed loop of an interrupted run with the same schedule (0 if none)."""
+    path = _resume_path()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            marker = json.load(f)
+    except FileNotFoundError:
+        return 0
+    except Exception as e:
+        LOGGER.warning("Ignoring unreadable resume marker %s: %s", path, e)
+        return 0
+    if marker.get("copies_schedule") != COPIES_SCHEDULE or not os.path.exists(CSV_PATH):
+        LOGGER.warning("Resume marker %s does not match this run; starting fresh.", path)
+        return 0
+    return int(marker.get("last_completed_loop", 0))
+
+def save_resume_marker(loop_idx):
+    path = _resume_path()
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"csv_path": CSV_PATH, "copies_schedule": COPIES_SCHEDULE,
+                   "last_completed_loop": loop_idx,
+                   "updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}, f)
+        f.flush()
+        if CSV_FSYNC:
+            os.fsync(f.fileno())
+    os.replace(tmp, path)  # atomic: a crash leaves the old or the new marker
+
+def clear_resume_marker():
+    try:
+        os.remove(_resume_path())
+    except FileNotFoundError:
+        pass
+
+def reconcile_csv(last_done):
+    """
+    On resume the marker is authoritative: drop CSV rows past its last loop (appended
+    just before a crash, or cut off mid-write), so the re-run loops aren't duplicated.
+    """
+    with open(CSV_PATH, "r", newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    if not rows:
+        return 0
+    header, body = rows[0], rows[1:]
+    keep = [r for r in body if len(r) == len(header) and r[0].isdigit() and int(r[0]) <= last_done]
+    dropped = len(body) - len(keep)
+    if dropped:
+        tmp = CSV_PATH + ".tmp"
+        with open(tmp, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(header)
+            w.writerows(keep)
+            f.flush()
+            if CSV_FSYNC:
+                os.fsync(f.fileno())
+        os.replace(tmp, CSV_PATH)
+        LOGGER.warning("✂️ Dropped %d CSV rows past resumed loop %d", dropped, last_done)
+    return dropped
+
+def init_csv(fresh: bool):
+    if fresh or not os.path.exists(CSV_PATH):
+        with open(CSV_PATH, "w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerow(CSV_HEADERS)
+    LOGGER.info("🧾 %s CSV: %s", "Writing" if fresh else "Appending to", CSV_PATH)
+
+def append_csv_row(row):
+    with open(CSV_PATH, "a", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerow(row)
+        f.flush()
+        if CSV_FSYNC:
+            os.fsync(f.fileno())
+
+def output_folder_for(pi_id):
+    # out dir (node-local under OUT_DIR)
+    output_folder = os.path.join(OUT_DIR, f"analyzed_images_from_{pi_id}")
+    os.makedirs(output_folder, exist_ok=True)
+    return output_folder
+
+def pin_parent():
+    """Pin the parent (MQTT, decode, sampler, metrics threads started after this) to its reserved core."""
+    if CPU_LAYOUT["parent_cpu"] is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {CPU_LAYOUT["parent_cpu"]})
+
+def clear_ready():
+    if METRICS is not None:
+        METRICS.ready.set(0)
+    if READY_FILE:
+        try:
+            os.remove(READY_FILE)
+        except FileNotFoundError:
+            pass
+
+class Runtime:
+    """State shared by both run modes: worker pool (or per-Pi lanes), result queue, cache, stats and DB sink."""
+    def __init__(self):
+        self.hostname = socket.gethostname()
+        self.result_q = None
+        self.cache_mgr = None
+        self.pose_cache = None
+        self.pool = None
+        self.lanes = []  # single-worker pools for sticky per-Pi routing (TRACKING)
+        self.tuner = None
+        self.writer_stats = WriterStats()
+        self.pending_rows = []  # DB rows waiting for their background write to be confirmed
+        self.pool_barrier = None
+        self.sink = None
+        self.decoders = []
+        self.sampler = None
+        self.warmup_s = None
+        self.slots = None  # next worker slot for PIN_WORKERS
+        self.worker_pids = []  # from the warm-up reports
+        self.preload_s = None
+
+    def start_sampler(self):
+        # one sampler for the whole run; loops and stream intervals slice its timeline
+        self.sampler = ResourceSampler(interval_ms=SAMPLER_INTERVAL_MS).start()
+
+    def export_timeline(self):
+        if SAMPLER_TIMELINE and self.sampler is not None:
+            self.sampler.export_timeline(_timeline_csv_path())
+
+    def start_pool(self):
+        clear_ready()
+        if SHARED_FRAMES:
+            # workers must share the parent's tracker, or their own would unlink frames on exit
+            resource_tracker.ensure_running()
+        self.result_q = MP_CONTEXT.Queue() if DISPATCH_MODE == "chunked" else None
+        if POSE_CACHE:
+            self.cache_mgr = PoseCacheManager(ctx=MP_CONTEXT)
+            self.cache_mgr.start()
+            self.pose_cache = self.cache_mgr.PoseCache(POSE_CACHE_SIZE, POSE_CACHE_TTL_S)
+            LOGGER.info("🗃️ Pose cache enabled: size=%d ttl=%ss hash=%s",
+                        POSE_CACHE_SIZE, POSE_CACHE_TTL_S, "xxhash" if xxhash else "blake2b")
+        self.preload_s = preload_models()
+        if START_METHOD == "fork":
+            # keep the collector from touching (and un-sharing) everything loaded so far
+            gc.freeze()
+        if MODE == "stream" and TRACKING:
+            self.lanes = [self._new_pool(1, MP_CONTEXT.Barrier(1) if WARMUP else None)
+                          for _ in range(NUM_WORKERS)]
+            LOGGER.info("🎯 Tracking mode: %d sticky lanes, session reset after %ss gap",
+                        len(self.lanes), TRACKING_GAP_S)
+            self.warm_up()
+            return
+        self.pool_barrier = MP_CONTEXT.Barrier(NUM_WORKERS) if WARMUP or WRITER_THREADS > 0 else None
+        self.pool = self._new_pool(NUM_WORKERS, self.pool_barrier)
+        self.warm_up()
+        fixed_chunk = None if CHUNK_SIZE.lower() == "auto" else max(1, int(CHUNK_SIZE))
+        self.tuner = ChunkTuner(fixed=fixed_chunk, overhead_pct=CHUNK_OVERHEAD_PCT, workers=NUM_WORKERS,
+                                minimum=CHUNK_MIN)
+        if self.result_q is not None and fixed_chunk is None and MODE != "stream":
+            self.tuner.measure_overhead(self.pool)
+
+    def _new_pool(self, workers, barrier=None):
+        pin = None
+        if CPU_LAYOUT["worker_cpus"]:
+            if self.slots is None:
+                self.slots = MP_CONTEXT.Value("i", 0)  # shared by all lanes: one core per worker
+            pin = (self.slots, CPU_LAYOUT["worker_cpus"])
+        return ProcessPoolExecutor(max_workers=workers, mp_context=MP_CONTEXT, initializer=_worker_init,
+                                   initargs=(self.result_q, self.pose_cache, barrier, pin, WORKER_THREADS))
+
+    def warm_up(self):
+        """Start every worker, load its models and run one dummy inference before any frame arrives."""
+        if not WARMUP:
+            return
+        t0 = time.perf_counter()
+        pools = [(lane, 1) for lane in self.lanes] or [(self.pool, NUM_WORKERS)]
+        futures = [pool.submit(_warmup, WARMUP_TIMEOUT_S) for pool, workers in pools for _ in range(workers)]
+        reports = [f.result() for f in futures]
+        self.warmup_s = time.perf_counter() - t0
+        self.worker_pids = sorted({r[0] for r in reports})
+        load = np.array([r[1] or 0.0 for r in reports])
+        infer = np.array([r[2] for r in reports])
+        hot = len({r[0] for r in reports})
+        LOGGER.info("🔥 Warm-up: %d/%d workers hot in %.2fs | model load p50=%.2fs max=%.2fs | "
+                    "first inference p50=%.3fs max=%.3fs", hot, len(futures), self.warmup_s,
+                    np.median(load), load.max(), np.median(infer), infer.max())
+        if hot < len(futures):
+            LOGGER.warning("⚠️ Warm-up barrier timed out after %ss; some workers are still cold", WARMUP_TIMEOUT_S)
+        if METRICS is not None:
+            METRICS.warmup.set(self.warmup_s)
+        self.log_worker_memory("after warm-up")
+
+    def worker_memory(self):
+        """smaps_rollup figures per live worker (needs WARMUP for the pids)."""
+        return [m for m in map(smaps_rollup_mb, self.worker_pids) if m is not None]
+
+    def workers_pss_mb(self):
+        mem = self.worker_memory()
+        return round(sum(m["pss"] for m in mem), 3) if mem else None
+
+    def log_worker_memory(self, when):
+        mem = self.worker_memory()
+        if not mem:
+            return
+        rss = np.array([m["rss"] for m in mem])
+        pss = np.array([m["pss"] for m in mem])
+        shared = np.array([m["shared"] for m in mem])
+        LOGGER.info("🧠 Worker memory %s: %d workers | RSS p50=%.1fMB max=%.1fMB | PSS p50=%.1fMB total=%.1fMB | shared p50=%.1fMB",
+                    when, len(mem), np.median(rss), rss.max(), np.median(pss), pss.sum(), np.median(shared))
+
+    def mark_ready(self):
+        if READY_FILE:
+            with open(READY_FILE, "w") as f:
+                json.dump({"host": self.hostname, "workers": NUM_WORKERS, "warmup_seconds": self.warmup_s}, f)
+        if METRICS is not None:
+            METRICS.ready.set(1)
+        LOGGER.info("✅ Ready%s", f" ({READY_FILE})" if READY_FILE else "")
+
+    def pool_for(self, pi_id):
+        """The shared pool, or the Pi's own lane in tracking mode (same Pi -> same worker)."""
+        if self.lanes:
+            return self.lanes[zlib.crc32(pi_id.encode("utf-8")) % len(self.lanes)]
+        return self.pool
+
+    def start_ingest(self):
+        if db_pool is not None:
+            self.sink = DBSink(db_pool, DB_BATCH_SIZE, DB_FLUSH_INTERVAL_S, DB_POOL_SIZE)
+        if METRICS is not None:
+            METRICS.watch_queue("writer", self.writer_stats.queue_depth)
+            if self.sink is not None:
+                METRICS.watch_queue("db", self.sink.q.qsize)
+        self.decoders = start_decoders()
+
+    def share(self, image_bgr, jpeg, infer=None):
+        """Place a frame for the workers; returns (SharedFrame or None, task arg, cache key)."""
+        shared = SharedFrame(image_bgr, jpeg, infer) if SHARED_FRAMES else None
+        frame_arg = shared.descriptor if shared else image_bgr
+        frame_key = frame_digest(image_bgr) if self.pose_cache is not None else None
+        return shared, frame_arg, frame_key
+
+    def flush_writers(self):
+        """
+        End of a benchmark loop: every worker drains its writer and reports final stats.
+        Pending DB rows go out afterwards, without a filename if that file failed to write.
+        Returns the failed file names.
+        """
+        failed = []
+        if self.pool is not None and WRITER_THREADS > 0:
+            if self.pool_barrier is not None and self.pool_barrier.broken:
+                self.pool_barrier.reset()
+            futures = [self.pool.submit(_flush_writer, WARMUP_TIMEOUT_S) for _ in range(NUM_WORKERS)]
+            reports = [f.result() for f in futures]
+            for pid, report, names in reports:
+                self.observe_writer(report)
+                failed.extend(names)
+            self.writer_stats.failed += len(failed)
+            if len({r[0] for r in reports}) < NUM_WORKERS:
+                LOGGER.warning("⚠️ Writer flush reached %d/%d workers; writer figures may lag",
+                               len({r[0] for r in reports}), NUM_WORKERS)
+            if failed:
+                LOGGER.error("❌ %d image writes failed: %s", len(failed), ", ".join(failed[:5]))
+        rows, self.pending_rows = self.pending_rows, []
+        lost = set(failed)
+        for row in rows:
+            self.sink.put(row if row[1] not in lost else (row[0], None) + row[2:])
+        return failed
+
+    def observe_writer(self, report):
+        if not report:
+            return
+        snap, durations = report
+        self.writer_stats.update(snap)
+        if METRICS is not None:
+            for seconds in durations:
+                METRICS.observe("imwrite", seconds)
+
+    def record(self, result, pi_id, received_time, analyzed_time, submitted=None, defer=False):
+        self.observe_writer(result.writer)
+        if METRICS is not None:
+            METRICS.observe_result(result)
+            METRICS.observe("end_to_end", (analyzed_time - received_time).total_seconds())
+            if submitted is not None and result.worker_seconds is not None:
+                METRICS.observe("dispatch", max(0.0, time.perf_counter() - submitted - result.worker_seconds))
+        # Optional DB row (one record per copy), flushed in the background;
+        # with defer, rows for pending writes wait for flush_writers()
+        if self.sink is not None:
+            row = (
+                pi_id,
+                result.filename,
+                received_time,
+                analyzed_time,
+                result.neck_angle,
+                result.body_angle,
+                result.posture_status,
+                result.landmarks_detected,
+                self.hostname
+            )
+            if defer and result.saved is None:
+                self.pending_rows.append(row)
+            else:
+                self.sink.put(row)
+
+    def shutdown(self, wait=True):
+        clear_ready()
+        self.log_worker_memory("at shutdown")
+        stop_decoders(self.decoders)
+        if self.sampler is not None:
+            self.sampler.stop()
+            self.export_timeline()
+        for pool in [self.pool] + self.lanes:
+            if pool is not None:
+                pool.shutdown(wait=wait, cancel_futures=True)
+        if self.cache_mgr is not None:
+            self.cache_mgr.shutdown()
+        if self.sink is not None:
+            self.sink.close()
+        if db_pool is not None:
+            try: db_pool.closeall()
+            except Exception: pass
+
+class LoopResults:
+    """Per-loop result columns, preallocated for `copies` rows and filled as results arrive."""
+    def __init__(self, copies):
+        self.n = 0
+        self.proc_time = np.zeros(copies, dtype=np.float64)
+        self.worker_seconds = np.full(copies, np.nan, dtype=np.float64)
+        self.status = np.zeros(copies, dtype=np.uint8)
+
+    def add(self, result, proc_time):
+        i = self.n
+        self.proc_time[i] = proc_time
+        if result.worker_seconds is not None:
+            self.worker_seconds[i] = result.worker_seconds
+        self.status[i] = result.status
+        self.n += 1
+
+    def avg_time(self):
+        return float(self.proc_time[:self.n].mean()) if self.n else 0.0
+
+    def worker_times(self):
+        return self.worker_seconds[:self.n][~np.isnan(self.worker_seconds[:self.n])].tolist()
+
+    def status_counts(self):
+        counts = np.bincount(self.status[:self.n], minlength=len(PostureStatus))
+        return {s.label: int(counts[s]) for s in PostureStatus if counts[s]}
+
+def run_benchmark(rt):
+    pose_cache = rt.pose_cache
+    last_done = load_resume_marker() if RESUME else 0
+    if last_done:
+        LOGGER.info("↩️ Resuming after loop %d (marker %s)", last_done, _resume_path())
+        reconcile_csv(last_done)
+    init_csv(fresh=last_done == 0)
+
+    for loop_idx, copies in enumerate(COPIES_SCHEDULE, start=1):
+        if loop_idx <= last_done:
+            continue
+        LOGGER.info("⏩ Loop %d/%d: waiting for ONE MQTT image (copies=%d)...", loop_idx, len(COPIES_SCHEDULE), copies)
+        dropped_before = ingest.dropped_total()
+        topic, image_bgr, infer, received_time, decode_s, jpeg, decoded_at = frame_q.get()  # block for one image
+        if METRICS is not None:
+            METRICS.observe("frame_wait", time.perf_counter() - decoded_at)
+        pi_id = pi_id_from_topic(topic)
+        output_folder = output_folder_for(pi_id)
+
+        h, w = image_bgr.shape[:2]
+        unique_id = random.randint(10000, 99999)
+
+        loop_start = rt.sampler.mark(f"loop {loop_idx} start")
+
+        # place the frame once; tasks carry only a small descriptor
+        shared, frame_arg, frame_key = rt.share(image_bgr, jpeg, infer)
+        cache_before = pose_cache.stats() if pose_cache is not None else None
+        writer_before = rt.writer_stats.totals()
+
+        loop_t0 = time.perf_counter()
+        results = dispatch_copies(rt.pool, rt.tuner, rt.result_q, loop_idx, copies, frame_arg,
+                                  w, h, pi_id, unique_id, output_folder, frame_key)
+
+        loop_results = LoopResults(copies)
+
+        for result, submitted in results:
+            analyzed_time = datetime.now()
+            loop_results.add(result, (analyzed_time - received_time).total_seconds())
+            rt.record(result, pi_id, received_time, analyzed_time, submitted, defer=True)
+
+        finished = loop_results.n
+        rt.flush_writers()
+        writer_window_s = time.perf_counter() - loop_t0
+        rt.tuner.observe(loop_results.worker_times())
+
+        if shared is not None:
+            shared.release()
+
+        loop_stats = rt.sampler.summary(loop_start, rt.sampler.mark(f"loop {loop_idx} end"))
+        rt.export_timeline()
+        avg_time = loop_results.avg_time()
+        cache_hits = cache_misses = None
+        if pose_cache is not None:
+            cache_after = pose_cache.stats()
+            cache_hits = cache_after["hits"] - cache_before["hits"]
+            cache_misses = cache_after["misses"] - cache_before["misses"]
+        writer = rt.writer_stats.loop_summary(writer_before, writer_window_s)
+        ingest_dropped = ingest.dropped_total() - dropped_before
+        append_csv_row([loop_idx, copies, finished, round(avg_time, 6), pi_id,
+                        received_time.strftime("%Y-%m-%d %H:%M:%S"),
+                        loop_stats.get("avg_gpu_pct"), loop_stats.get("avg_cpu_pct"), loop_stats.get("avg_ram_pct"),
+                        cache_hits, cache_misses, round(decode_s, 6),
+                        writer["writer_files"], writer["writer_mb_per_s"], writer["writer_queue_max"],
+                        writer["writer_failed"], ingest_dropped,
+                        loop_stats.get("avg_proc_cpu_pct"), loop_stats.get("avg_proc_rss_mb"),
+                        loop_stats.get("avg_container_cpu_pct"), loop_stats.get("avg_container_mem_mb"),
+                        loop_stats.get("avg_cpu_core_pct"), loop_stats.get("sampler_backend")]
+                       + [loop_stats.get(c) for c in SAMPLER_SPREAD_COLUMNS] + [MODEL_COMPLEXITY, rt.workers_pss_mb()])
+        save_resume_marker(loop_idx)
+
+        LOGGER.info("✅ Loop %d done: processed=%d, avg_process_time=%.6fs, decode=%.6fs | GPU%%=%s CPU%%=%s RAM%%=%s tree CPU%%=%s RSS=%sMB (%s) | cache hit/miss=%s/%s | writer files=%s MB/s=%s qmax=%s failed=%s | ingest dropped=%d",
+                    loop_idx, finished, avg_time, decode_s,
+                    loop_stats.get("avg_gpu_pct"), loop_stats.get("avg_cpu_pct"), loop_stats.get("avg_ram_pct"),
+                    loop_stats.get("avg_proc_cpu_pct"), loop_stats.get("avg_proc_rss_mb"), loop_stats.get("sampler_backend"),
+                    cache_hits, cache_misses,
+                    writer["writer_files"], writer["writer_mb_per_s"], writer["writer_queue_max"],
+                    writer["writer_failed"], ingest_dropped)
+        LOGGER.info("🧍 Posture: %s", loop_results.status_counts())
+        if ingest_dropped:
+            LOGGER.info("📥 Ingest per Pi: %s", ingest.stats())
+        if rt.sink is not None:
+            LOGGER.info("🗄️ DB sink: %s", rt.sink.stats())
+
+    # after all loops: the run is complete, nothing left to resume
+    clear_resume_marker()
     LOGGER.info("🧾 Wrote CSV: %s", CSV_PATH)
 
-def main():
-    hostname = socket.gethostname()
-    pool = ProcessPoolExecutor(max_workers=NUM_WORKERS, initializer=_worker_init)
+STREAM_CSV_HEADERS = ["time", "interval_seconds", "frames_done", "frames_per_second",
+                      "latency_p50_seconds", "latency_p95_seconds", "latency_max_seconds",
+                      "inflight", "ingest_queue_depth", "ingest_dropped",
+                      "model_complexity", "frames_by_model", "workers_pss_mb"]
+
+def _stream_csv_path():
+    root, ext = os.path.splitext(CSV_PATH)
+    return f"{root}_stream{ext or '.csv'}"
+
+def _timeline_csv_path():
+    root, ext = os.path.splitext(CSV_PATH)
+    return f"{root}_timeline{ext or '.csv'}"
+
+class RollingStats:
+    """Rolling throughput/latency for stream mode: last `window` latencies, counts per interval."""
+    def __init__(self, window=500):
+        self.latencies = deque(maxlen=max(1, window))
+        self.done = 0
+        self.total = 0
+        self.by_model = {}
+        self.since = time.monotonic()
+
+    def add(self, latency_s, model=None):
+        self.latencies.append(latency_s)
+        self.done += 1
+        self.total += 1
+        self.by_model[model] = self.by_model.get(model, 0) + 1
+
+    def snapshot(self):
+        now = time.monotonic()
+        interval = now - self.since
+        lat = np.asarray(self.latencies, dtype=np.float64)
+        snap = {
+            "interval_seconds": round(interval, 3),
+            "frames_done": self.done,
+            "frames_per_second": round(self.done / interval, 3) if interval > 0 else None,
+            "latency_p50_seconds": round(float(np.percentile(lat, 50)), 6) if lat.size else None,
+            "latency_p95_seconds": round(float(np.percentile(lat, 95)), 6) if lat.size else None,
+            "latency_max_seconds": round(float(lat.max()), 6) if lat.size else None,
+            "frames_by_model": ";".join(f"{k}:{v}" for k, v in sorted(self.by_model.items(), key=str)) or None,
+        }
+        self.done = 0
+        self.by_model = {}
+        self.since = now
+        return snap
+
+def run_stream(rt):
+    """Analyze every incoming frame once, keeping up to STREAM_MAX_INFLIGHT frames in the pool."""
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+    stats_path = _stream_csv_path()
+    with open(stats_path, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerow(STREAM_CSV_HEADERS)
+    LOGGER.info("🌊 Stream mode: max_inflight=%d, stats every %ss -> %s",
+                STREAM_MAX_INFLIGHT, STREAM_STATS_INTERVAL_S, stats_path)
+
+    stats = RollingStats(STREAM_STATS_WINDOW)
+    controller = None
+    if ADAPTIVE_COMPLEXITY:
+        controller = ComplexityController(LATENCY_SLO_S, NUM_WORKERS, ADAPTIVE_WINDOW, start=MODEL_COMPLEXITY)
+        LOGGER.info("🎚️ Adaptive model complexity: SLO=%.3fs, starting at %d", LATENCY_SLO_S, controller.current)
+    inflight = {}  # future -> (SharedFrame or None, pi_id, received_time, submit perf_counter)
+    seq = 0
+    dropped_before = ingest.dropped_total()
+    next_report = time.monotonic() + STREAM_STATS_INTERVAL_S
+
+    def _reap(done):
+        for f in done:
+            shared, pi_id, received_time, submitted = inflight.pop(f)
+            if shared is not None:
+                shared.release()
+            try:
+                result = f.result()
+            except Exception as e:
+                LOGGER.error("Worker task failed: %s", e)
+                continue
+            analyzed_time = datetime.now()
+            stats.add((analyzed_time - received_time).total_seconds(), result.model_complexity)
+            if controller is not None:
+                controller.observe(result.model_complexity, result.worker_seconds)
+            rt.record(result, pi_id, received_time, analyzed_time, submitted)
+
+    def _report():
+        nonlocal dropped_before
+        snap = stats.snapshot()
+        snap.update({"inflight": len(inflight), "ingest_queue_depth": ingest.qsize(),
+                     "ingest_dropped": ingest.dropped_total() - dropped_before,
+                     "model_complexity": controller.current if controller is not None else MODEL_COMPLEXITY,
+                     "workers_pss_mb": rt.workers_pss_mb()})
+        dropped_before += snap["ingest_dropped"]
+        with open(stats_path, "a", newline="", encoding="utf-8") as fh:
+            csv.writer(fh).writerow([datetime.now().strftime("%Y-%m-%d %H:%M:%S")]
+                                   + [snap[k] for k in STREAM_CSV_HEADERS[1:]])
+        LOGGER.info("🌊 %d frames (%s fps) | latency p50=%ss p95=%ss max=%ss | inflight=%d ingest_q=%d dropped=%d | models %s",
+                    snap["frames_done"], snap["frames_per_second"], snap["latency_p50_seconds"],
+                    snap["latency_p95_seconds"], snap["latency_max_seconds"],
+                    snap["inflight"], snap["ingest_queue_depth"], snap["ingest_dropped"],
+                    snap["frames_by_model"])
+        rt.export_timeline()
+
+    try:
+        while not stop.is_set():
+            # backpressure: stop pulling frames while the pool is saturated
+            if len(inflight) >= STREAM_MAX_INFLIGHT:
+                done, _ = wait(list(inflight), timeout=0.5, return_when=FIRST_COMPLETED)
+                _reap(done)
+            else:
+                try:
+                    topic, image_bgr, infer, received_time, decode_s, jpeg, decoded_at = frame_q.get(timeout=0.5)
+                except queue.Empty:
+                    pass
+                else:
+                    pi_id = pi_id_from_topic(topic)
+                    h, w = image_bgr.shape[:2]
+                    seq += 1
+                    shared, frame_arg, frame_key = rt.share(image_bgr, jpeg, infer)
+                    if METRICS is not None:
+                        METRICS.observe("frame_wait", time.perf_counter() - decoded_at)
+                    complexity = MODEL_COMPLEXITY
+                    if controller is not None:
+                        complexity = controller.choose(ingest.qsize() + frame_q.qsize() + len(inflight))
+                    session = pi_id if TRACKING else None
+                    f = _track(rt.pool_for(pi_id).submit(analyze_and_save, 0, frame_arg, w, h, pi_id, f"{seq:08d}",
+                                                         output_folder_for(pi_id), frame_key, complexity, session,
+                                                         True))
+                    inflight[f] = (shared, pi_id, received_time, time.perf_counter())
+                _reap([f for f in list(inflight) if f.done()])
+
+            if time.monotonic() >= next_report:
+                next_report = time.monotonic() + STREAM_STATS_INTERVAL_S
+                _report()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        LOGGER.info("🛑 Stream stopping: draining %d in-flight frames (%d analyzed)", len(inflight), stats.total)
+        _reap(wait(list(inflight))[0])
+        _report()  # last, partial interval
 
+def main():
+    steps = startup()
+    pin_parent()
+    _timed(steps, "metrics", start_metrics)
+    rt = Runtime()
+    _timed(steps, "pool", rt.start_pool)
+
+    t0 = time.perf_counter()
+    import paho.mqtt.client as mqtt
     client = mqtt.Client(protocol=mqtt.MQTTv311)
     client.on_connect = on_connect
     client.on_message = on_message
@@ -450,100 +2824,32 @@ def main():
         client.connect(BROKER, PORT, 60)
     except Exception as e:
         LOGGER.error("❌ MQTT connect failed: %s", e)
-        pool.shutdown(wait=False, cancel_futures=True)
+        rt.shutdown(wait=False)
         return
+    steps["mqtt"] = time.perf_counter() - t0
 
+    _timed(steps, "ingest", rt.start_ingest)
+    rt.start_sampler()
     client.loop_start()
-
-    rows = []
+    rt.mark_ready()
+    LOGGER.info("⏱️ Startup %.2fs: %s (pool: preload=%.2fs warm-up=%s)", sum(steps.values()),
+                " ".join(f"{k}={v:.2f}s" for k, v in steps.items()),
+                rt.preload_s or 0.0, f"{rt.warmup_s:.2f}s" if rt.warmup_s is not None else "off")
 
     try:
-        for loop_idx, copies in enumerate(COPIES_SCHEDULE, start=1):
-            LOGGER.info("⏩ Loop %d/10: waiting for ONE MQTT image (copies=%d)...", loop_idx, copies)
-            topic, image_bgr, received_time = message_q.get()  # block for one image
-            # derive pi_id from topic
-            parts = topic.split("/")
-            pi_id = parts[1] if len(parts) > 1 else "unknown"
-
-            # out dir (node-local under OUT_DIR)
-            output_folder = os.path.join(OUT_DIR, f"analyzed_images_from_{pi_id}")
-            os.makedirs(output_folder, exist_ok=True)
-
-            h, w = image_bgr.shape[:2]
-            unique_id = random.randint(10000, 99999)
-
-            sampler = ResourceSampler(interval_ms=200).start()
-
-            futures = [
-                pool.submit(analyze_and_save, i, image_bgr, w, h, pi_id, unique_id, output_folder)
-                for i in range(copies)
-            ]
-
-            total_time = 0.0
-            finished = 0
-
-            for f in as_completed(futures):
-                try:
-                    result = f.result()
-                    analyzed_time = datetime.now()
-                    proc_time = (analyzed_time - received_time).total_seconds()
-                    total_time += proc_time
-                    finished += 1
-
-                    # Optional DB insert (one record per copy)
-                    if cursor is not None:
-                        try:
-                            cursor.execute(
-                                """
-                                INSERT INTO posture_log
-                                (pi_id, filename, received_time, analyzed_time, neck_angle, body_angle,
-                                 posture_status, landmarks_detected, processed_by)
-                                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                                """,
-                                (
-                                    pi_id,
-                                    result.get("filename"),
-                                    received_time,
-                                    analyzed_time,
-                                    result.get("neck_angle"),
-                                    result.get("body_angle"),
-                                    result.get("posture_status"),
-                                    result.get("landmarks_detected"),
-                                    hostname
-                                )
-                            )
-                            conn.commit()
-                        except Exception as db_e:
-                            LOGGER.error("DB insert failed for %s: %s", result.get("filename"), db_e)
-                except Exception as e:
-                    LOGGER.error("Worker task failed: %s", e)
-
-            loop_stats = sampler.stop_and_summary() if "sampler" in locals() and sampler else {"avg_gpu_pct": None, "avg_cpu_pct": None, "avg_ram_pct": None}
-            avg_time = (total_time / finished) if finished else 0.0
-            rows.append([loop_idx, copies, finished, round(avg_time, 6), pi_id,
-                         received_time.strftime("%Y-%m-%d %H:%M:%S"),
-                         loop_stats.get("avg_gpu_pct"), loop_stats.get("avg_cpu_pct"), loop_stats.get("avg_ram_pct")])
-
-            LOGGER.info("✅ Loop %d done: processed=%d, avg_process_time=%.6fs | GPU%%=%s CPU%%=%s RAM%%=%s",
-                        loop_idx, finished, avg_time,
-                        loop_stats.get("avg_gpu_pct"), loop_stats.get("avg_cpu_pct"), loop_stats.get("avg_ram_pct"))
-
-        # after all 10 loops
-        write_csv(rows)
-
+        if MODE == "stream":
+            run_stream(rt)
+        else:
+            run_benchmark(rt)
     finally:
         try:
             client.loop_stop()
             client.disconnect()
         except Exception:
             pass
-        pool.shutdown(wait=True, cancel_futures=True)
-        if cursor is not None:
-            try: cursor.close()
-            except Exception: pass
-        if conn is not None:
-            try: conn.close()
-            except Exception: pass
+        rt.shutdown()
+
+_IMPORT_S = time.perf_counter() - _IMPORT_T0
 
 if __name__ == "__main__":
     main()
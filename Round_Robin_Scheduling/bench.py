@@ -0,0 +1,245 @@
+"""
+Offline micro-benchmarks for the posture analyzer (no MQTT broker needed).
+
+  python bench.py decode [--image sample.jpg] [--repeat 200]
+  python bench.py scale  [--images frames/] [--scales 1 2 4] [--repeat 5]
+  python bench.py postproc [--frames 100000]
+  python bench.py threads [--images frames/] [--budget 8] [--splits 8x1 4x2 2x4] [--pin]
+"""
+import os
+import sys
+import time
+import base64
+import argparse
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import Images_From_Pi1 as analyzer
+
+
+def load_sample(path):
+    if path:
+        img = cv2.imread(path, cv2.IMREAD_COLOR)
+        if img is None:
+            raise SystemExit(f"❌ Could not read image: {path}")
+        return img
+    # synthetic 1280x720 frame (same size the Pi publishes)
+    rng = np.random.default_rng(0)
+    img = cv2.GaussianBlur(rng.integers(0, 256, (720, 1280, 3), dtype=np.uint8), (15, 15), 0)
+    return img
+
+
+def legacy_decode(payload):
+    """The previous try-base64-then-raw decoder, kept as the baseline."""
+    try:
+        data = base64.b64decode(payload, validate=True)
+        img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if img is not None:
+            return img, "base64"
+    except Exception:
+        pass
+    img = cv2.imdecode(np.frombuffer(payload, np.uint8), cv2.IMREAD_COLOR)
+    return img, "raw" if img is not None else "unknown"
+
+
+def time_call(fn, arg, repeat):
+    fn(arg)  # warm-up
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(arg)
+        samples.append(time.perf_counter() - t0)
+    samples.sort()
+    return statistics.mean(samples), samples[len(samples) // 2], samples[int(len(samples) * 0.95) - 1]
+
+
+def cmd_decode(args):
+    img = load_sample(args.image)
+    jpg = cv2.imencode(".jpg", img)[1].tobytes()
+    png = cv2.imencode(".png", img)[1].tobytes()
+    payloads = {
+        "base64-jpeg (Pi)": base64.b64encode(jpg),
+        "raw-jpeg": jpg,
+        "base64-png": base64.b64encode(png),
+        "raw-png": png,
+    }
+    print(f"🔬 decode benchmark | frame={img.shape[1]}x{img.shape[0]} repeat={args.repeat} "
+          f"| base64={'pybase64' if analyzer.pybase64 else 'binascii'}")
+    print(f"{'encoding':<18}{'bytes':>10}{'sniffed':>10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'legacy p50':>12}")
+    for name, payload in payloads.items():
+        _, enc = analyzer.decode_image(payload)
+        mean, p50, p95 = time_call(analyzer.decode_image, payload, args.repeat)
+        _, legacy_p50, _ = time_call(legacy_decode, payload, args.repeat)
+        print(f"{name:<18}{len(payload):>10}{enc:>10}{mean * 1e3:>10.3f}{p50 * 1e3:>10.3f}"
+              f"{p95 * 1e3:>10.3f}{legacy_p50 * 1e3:>12.3f}")
+
+
+def load_frames(path):
+    """JPEG bytes of one image or every .jpg/.png in a directory (default: synthetic frame)."""
+    if path and os.path.isdir(path):
+        names = sorted(n for n in os.listdir(path) if n.lower().endswith((".jpg", ".jpeg", ".png")))
+        frames = [cv2.imread(os.path.join(path, n), cv2.IMREAD_COLOR) for n in names]
+        frames = [f for f in frames if f is not None]
+        if not frames:
+            raise SystemExit(f"❌ No readable images in {path}")
+    else:
+        frames = [load_sample(path)]
+    return [cv2.imencode(".jpg", f)[1].tobytes() for f in frames]
+
+
+def cmd_scale(args):
+    """Latency and agreement with full-resolution inference per INFER_SCALE / method."""
+    jpegs = load_frames(args.images)
+    analyzer._worker_init()
+    settings = [(s, m) for s in args.scales for m in (("dct", "resize") if s > 1 else ("full",))]
+
+    def run(jpeg, scale, method):
+        t0 = time.perf_counter()
+        img = analyzer._imdecode(jpeg)
+        rgb = analyzer.prepare_inference(img, jpeg, scale, method)
+        t1 = time.perf_counter()
+        h, w = img.shape[:2]
+        pose = analyzer._estimate_pose(img, w, h, image_rgb=rgb, complexity=args.complexity)
+        return pose, t1 - t0, time.perf_counter() - t1, rgb.shape
+
+    baseline = [run(j, 1, "full")[0] for j in jpegs]
+    print(f"🔬 scale benchmark | frames={len(jpegs)} repeat={args.repeat} complexity={args.complexity}")
+    print(f"{'scale':>5} {'method':<7}{'input':>10}{'prep ms':>9}{'pose ms':>9}"
+          f"{'status %':>10}{'neck Δ°':>9}{'body Δ°':>9}{'lm Δpx':>9}")
+    for scale, method in settings:
+        prep, infer, agree, d_neck, d_body, d_lm = [], [], 0, [], [], []
+        for jpeg, base in zip(jpegs, baseline):
+            for _ in range(args.repeat):
+                pose, p_s, i_s, shape = run(jpeg, scale, method)
+                prep.append(p_s)
+                infer.append(i_s)
+            agree += pose["posture_status"] == base["posture_status"]
+            if pose["landmarks_detected"] and base["landmarks_detected"]:
+                d_neck.append(abs(pose["neck_angle"] - base["neck_angle"]))
+                d_body.append(abs(pose["body_angle"] - base["body_angle"]))
+            if pose["landmarks"] is not None and base["landmarks"] is not None:
+                h, w = analyzer._imdecode(jpeg).shape[:2]
+                a = np.asarray(pose["landmarks"])[:, :2] * (w, h)
+                b = np.asarray(base["landmarks"])[:, :2] * (w, h)
+                d_lm.append(float(np.linalg.norm(a - b, axis=1).mean()))
+
+        def _mean(vals):
+            return f"{statistics.mean(vals):.2f}" if vals else "-"
+
+        print(f"{scale:>5} {method:<7}{f'{shape[1]}x{shape[0]}':>10}{statistics.median(prep) * 1e3:>9.2f}"
+              f"{statistics.median(infer) * 1e3:>9.2f}{agree / len(jpegs) * 100:>10.1f}"
+              f"{_mean(d_neck):>9}{_mean(d_body):>9}{_mean(d_lm):>9}")
+
+
+def cmd_postproc(args):
+    """Landmark scoring cost: score_frame and score_landmarks per frame, and score_landmarks batched."""
+    rng = np.random.default_rng(0)
+    lms = rng.random((args.frames, 33, 4)).astype(np.float32)
+    lms[..., 3] = np.where(rng.random((args.frames, 33)) < 0.8, 0.95, lms[..., 3])  # mostly visible
+    w, h = 1280, 720
+    rows = lms.tolist()
+
+    # one frame per call, as a worker scores each result
+    t0 = time.perf_counter()
+    single = [analyzer.score_frame(r, w, h) for r in rows]
+    t_single = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for i in range(args.frames):
+        analyzer.score_landmarks(lms[i], w, h)
+    t_single_np = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    scored = analyzer.score_landmarks(lms, w, h)
+    t_batch = time.perf_counter() - t0
+
+    batched = zip(scored["landmarks_detected"], scored["neck_angle"], scored["body_angle"], scored["posture_status"])
+    same = sum(1 for a, b in zip(single, batched) if tuple(a) == (bool(b[0]), int(b[1]), int(b[2]), int(b[3])))
+    print(f"🔬 landmark post-processing | frames={args.frames}")
+    print(f"{'score_frame (1 frame)':<24}{t_single / args.frames * 1e6:>10.2f} µs/frame")
+    print(f"{'NumPy (1 frame/call)':<24}{t_single_np / args.frames * 1e6:>10.2f} µs/frame")
+    print(f"{'NumPy (batched)':<24}{t_batch / args.frames * 1e6:>10.2f} µs/frame")
+    print(f"{'scalar == batched':<24}{same / args.frames * 100:>10.3f} %")
+
+
+def _infer(jpeg):
+    """Worker task for the threads sweep: decode + Pose on one frame, returns seconds."""
+    t0 = time.perf_counter()
+    img = analyzer._imdecode(jpeg)
+    h, w = img.shape[:2]
+    analyzer._estimate_pose(img, w, h, image_rgb=analyzer.prepare_inference(img, jpeg))
+    return time.perf_counter() - t0
+
+
+def _proc_threads(pid):
+    for line in (analyzer._read_file(f"/proc/{pid}/status") or "").splitlines():
+        if line.startswith("Threads:"):
+            return int(line.split()[1])
+    return None
+
+
+def cmd_threads(args):
+    """Throughput/latency per processes x threads split of a CPU budget."""
+    analyzer.configure()
+    jpegs = load_frames(args.images)
+    budget = args.budget or analyzer.CPU_LAYOUT["budget"]
+    if args.splits:
+        splits = [tuple(int(v) for v in s.lower().split("x")) for s in args.splits]
+    else:
+        # every split of the budget, plus all cores with the libraries' default pools
+        splits = sorted({(p, budget // p) for p in range(1, budget + 1)}, reverse=True) + [(budget, 0)]
+    cpus = analyzer.CPU_LAYOUT["cpus"]
+    print(f"🔬 threads sweep | budget={budget} cpus=[{analyzer._format_cpus(cpus)}] frames={args.frames} "
+          f"complexity={analyzer.MODEL_COMPLEXITY} pin={args.pin}")
+    print(f"{'procs':>5}{'threads':>8}{'thr/proc':>9}{'frames/s':>10}{'p50 ms':>9}{'p95 ms':>9}")
+    for procs, threads in splits:
+        ctx = analyzer.MP_CONTEXT
+        pin = (ctx.Value("i", 0), cpus) if args.pin and hasattr(os, "sched_setaffinity") else None
+        with ProcessPoolExecutor(max_workers=procs, mp_context=ctx, initializer=analyzer._worker_init,
+                                 initargs=(None, None, ctx.Barrier(procs), pin, threads)) as pool:
+            pids = [f.result()[0] for f in [pool.submit(analyzer._warmup, 60) for _ in range(procs)]]
+            t0 = time.perf_counter()
+            latencies = sorted(pool.map(_infer, (jpegs[i % len(jpegs)] for i in range(args.frames))))
+            wall = time.perf_counter() - t0
+            counts = [c for c in map(_proc_threads, pids) if c is not None]
+        print(f"{procs:>5}{threads or 'default':>8}{statistics.mean(counts) if counts else float('nan'):>9.1f}"
+              f"{args.frames / wall:>10.2f}{statistics.median(latencies) * 1e3:>9.1f}"
+              f"{latencies[int(len(latencies) * 0.95) - 1] * 1e3:>9.1f}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("decode", help="per-frame decode cost for each payload encoding")
+    p.add_argument("--image", help="sample image (default: synthetic 1280x720 frame)")
+    p.add_argument("--repeat", type=int, default=200)
+    p.set_defaults(func=cmd_decode)
+
+    p = sub.add_parser("scale", help="latency/accuracy of Pose per inference scale factor")
+    p.add_argument("--images", help="image or directory of frames (default: synthetic 1280x720 frame)")
+    p.add_argument("--scales", type=int, nargs="+", default=[1, 2, 4])
+    p.add_argument("--complexity", type=int, default=analyzer.MODEL_COMPLEXITY)
+    p.add_argument("--repeat", type=int, default=5)
+    p.set_defaults(func=cmd_scale)
+
+    p = sub.add_parser("postproc", help="scalar vs batched landmark scoring throughput")
+    p.add_argument("--frames", type=int, default=100000)
+    p.set_defaults(func=cmd_postproc)
+
+    p = sub.add_parser("threads", help="processes x threads sweep over the CPU budget")
+    p.add_argument("--images", help="image or directory of frames (default: synthetic 1280x720 frame)")
+    p.add_argument("--budget", type=int, help="CPUs to split (default: the analyzer's cgroup budget)")
+    p.add_argument("--splits", nargs="+", help="PROCSxTHREADS pairs, e.g. 4x2 (0 threads = library default)")
+    p.add_argument("--frames", type=int, default=64)
+    p.add_argument("--pin", action="store_true", help="pin each worker to THREADS cores")
+    p.set_defaults(func=cmd_threads)
+
+    args = ap.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""
+Offline replay of frames through the analyzer pipeline (no MQTT broker or Pi needed).
+
+  python replay.py run --frames frames/ [--schedule 10 20 40] [--report after.json]
+  python replay.py run --capture capture.jsonl --mode stream [--speed 2] [--rate 5]
+  python replay.py record --out capture.jsonl [--count 200] [--broker HOST] [--topic images/#]
+  python replay.py compare before.json after.json
+
+Frames enter through the analyzer's MQTT callback (on_message), encoded the way the Pi
+publishes them (base64 of the JPEG file), so ingest, decode, dispatch, workers, writer,
+sampler and CSV output all run as in a deployment. Benchmark mode feeds the next frame
+only once the previous loop's CSV row is written, so each loop's latency starts when
+its frame arrives. A capture file is JSONL: {"topic", "t" (seconds), "payload" (base64)}.
+Analyzer settings (NUM_WORKERS, INFER_SCALE, ...) are taken from the environment as usual.
+"""
+import os
+import sys
+import csv
+import json
+import time
+import base64
+import signal
+import argparse
+import threading
+from types import SimpleNamespace
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+analyzer = None  # imported in load_analyzer(), after the run's settings are in the environment
+
+
+def load_analyzer(args):
+    global analyzer
+    os.environ["MODE"] = args.mode
+    os.environ["CSV_PATH"] = args.csv
+    if args.schedule:
+        os.environ["COPIES_SCHEDULE"] = ",".join(str(c) for c in args.schedule)
+    os.environ["RESUME"] = "false"  # every replay starts from loop 1
+    os.environ.setdefault("METRICS_PORT", "0")
+    os.environ.setdefault("STREAM_STATS_INTERVAL_S", "1")
+    # node-local builds default to /app/analyzed_images
+    os.environ.setdefault("ANALYZED_DIR", "./analyzed_images")
+    import Images_From_Pi1
+    analyzer = Images_From_Pi1
+    return analyzer
+
+
+def pi_payload(path):
+    """What the Pi publishes for an image file: base64 of its JPEG bytes."""
+    if path.lower().endswith((".jpg", ".jpeg")):
+        with open(path, "rb") as f:
+            data = f.read()
+    else:
+        img = cv2.imread(path, cv2.IMREAD_COLOR)
+        if img is None:
+            raise SystemExit(f"❌ Could not read image: {path}")
+        data = cv2.imencode(".jpg", img)[1].tobytes()
+    return base64.b64encode(data)
+
+
+def load_frames(path, pis):
+    """(topic, t=None, payload) per image in a directory (sorted) or a single image, spread over `pis` Pis."""
+    if os.path.isdir(path):
+        names = sorted(n for n in os.listdir(path) if n.lower().endswith((".jpg", ".jpeg", ".png")))
+        paths = [os.path.join(path, n) for n in names]
+    else:
+        paths = [path]
+    if not paths:
+        raise SystemExit(f"❌ No images in {path}")
+    return [(f"images/pi{i % pis + 1}", None, pi_payload(p)) for i, p in enumerate(paths)]
+
+
+def load_capture(path):
+    frames = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                rec = json.loads(line)
+                frames.append((rec["topic"], rec.get("t"), base64.b64decode(rec["payload"])))
+    if not frames:
+        raise SystemExit(f"❌ Empty capture: {path}")
+    return frames
+
+
+def publish(topic, payload):
+    analyzer.on_message(None, None, SimpleNamespace(topic=topic, payload=payload, timestamp=time.monotonic()))
+    return time.perf_counter()
+
+
+def _csv_rows(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return max(0, sum(1 for _ in f) - 1)
+    except FileNotFoundError:
+        return 0
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def feed_benchmark(frames, loops, fed, done):
+    """One frame per loop, each published once the previous loop's row is in the CSV."""
+    for i in range(loops):
+        while _csv_rows(analyzer.CSV_PATH) < i:
+            time.sleep(0.005)
+        if i:
+            done.append(time.perf_counter())
+        topic, _, payload = frames[i % len(frames)]
+        fed.append(publish(topic, payload))
+
+
+def feed_stream(frames, repeat, rate, speed, fed):
+    """Publish every frame `repeat` times, at `rate` frames/s or the capture's own pace / `speed`."""
+    # run_stream owns SIGTERM once it has created its stats file
+    while not os.path.exists(analyzer._stream_csv_path()):
+        time.sleep(0.01)
+    start = time.perf_counter()
+    t_first = frames[0][1] or 0.0
+    span = (frames[-1][1] or 0.0) - t_first
+    period = span + (span / (len(frames) - 1) if len(frames) > 1 else 0.0)  # one capture pass
+    for n in range(repeat * len(frames)):
+        topic, t, payload = frames[n % len(frames)]
+        if rate:
+            due = n / rate
+        elif t is not None:
+            due = ((n // len(frames)) * period + t - t_first) / speed
+        else:
+            due = 0.0
+        delay = start + due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        fed.append(publish(topic, payload))
+    while analyzer.ingest.qsize() or analyzer.frame_q.qsize():
+        time.sleep(0.01)
+    time.sleep(0.2)  # let the last frame reach the pool before stopping
+    os.kill(os.getpid(), signal.SIGTERM)
+
+
+def benchmark_report(fed, done):
+    with open(analyzer.CSV_PATH, "r", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    loops = []
+    for row, t_fed, t_done in zip(rows, fed, done):
+        wall = t_done - t_fed
+        processed = int(row["processed_count"])
+        loops.append({"loop": int(row["loop_index"]), "copies": int(row["copies_in_loop"]),
+                      "processed": processed, "wall_seconds": round(wall, 4),
+                      "copies_per_second": round(processed / wall, 3) if wall > 0 else None,
+                      "avg_latency_seconds": float(row["avg_process_time_seconds"]),
+                      "decode_seconds": float(row["decode_time_seconds"]),
+                      "ingest_dropped": int(row["ingest_dropped"])})
+    copies = sum(lp["processed"] for lp in loops)
+    wall = sum(lp["wall_seconds"] for lp in loops)
+    return {"mode": "benchmark", "loops": loops,
+            "total": {"copies": copies, "wall_seconds": round(wall, 4),
+                      "copies_per_second": round(copies / wall, 3) if wall > 0 else None,
+                      "avg_latency_seconds": round(
+                          sum(lp["avg_latency_seconds"] * lp["processed"] for lp in loops) / copies, 6)
+                      if copies else None}}
+
+
+def stream_report(fed, finished):
+    with open(analyzer._stream_csv_path(), "r", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    frames = sum(int(r["frames_done"]) for r in rows)
+    wall = finished - fed[0] if fed else 0.0
+    last = rows[-1] if rows else {}
+
+    def _f(key):
+        return float(last[key]) if last.get(key) else None
+
+    return {"mode": "stream", "total": {
+        "frames_fed": len(fed), "frames_done": frames, "ingest_dropped": analyzer.ingest.dropped_total(),
+        "wall_seconds": round(wall, 4), "frames_per_second": round(frames / wall, 3) if wall > 0 else None,
+        # rolling window of the last STREAM_STATS_WINDOW frames (the whole run when it is shorter)
+        "latency_p50_seconds": _f("latency_p50_seconds"), "latency_p95_seconds": _f("latency_p95_seconds"),
+        "latency_max_seconds": _f("latency_max_seconds")}}
+
+
+def print_report(report):
+    if report["mode"] == "benchmark":
+        print(f"{'loop':>5}{'copies':>8}{'done':>7}{'wall s':>9}{'copies/s':>10}{'avg lat s':>11}{'decode ms':>11}")
+        for lp in report["loops"]:
+            print(f"{lp['loop']:>5}{lp['copies']:>8}{lp['processed']:>7}{lp['wall_seconds']:>9.3f}"
+                  f"{lp['copies_per_second'] or 0:>10.2f}{lp['avg_latency_seconds']:>11.4f}"
+                  f"{lp['decode_seconds'] * 1e3:>11.2f}")
+    for key, value in report["total"].items():
+        print(f"  {key:<22}{value}")
+
+
+def cmd_run(args):
+    load_analyzer(args)
+    frames = load_capture(args.capture) if args.capture else load_frames(args.frames, args.pis)
+    steps = analyzer.startup()
+    rt = analyzer.Runtime()
+    rt.start_pool()
+    rt.start_ingest()
+    rt.start_sampler()
+    _remove(analyzer.CSV_PATH)
+    _remove(analyzer._stream_csv_path())
+    print(f"🔁 replay | {len(frames)} frames from {args.capture or args.frames} | mode={args.mode} "
+          f"workers={analyzer.NUM_WORKERS} | startup {sum(steps.values()):.2f}s "
+          f"(preload {rt.preload_s or 0:.2f}s, warm-up {rt.warmup_s or 0:.2f}s)")
+
+    fed, done = [], []
+    try:
+        if args.mode == "stream":
+            feeder = threading.Thread(target=feed_stream, daemon=True,
+                                      args=(frames, args.repeat, args.rate, args.speed, fed))
+            feeder.start()
+            analyzer.run_stream(rt)
+            report = stream_report(fed, time.perf_counter())
+        else:
+            feeder = threading.Thread(target=feed_benchmark, daemon=True,
+                                      args=(frames, len(analyzer.COPIES_SCHEDULE), fed, done))
+            feeder.start()
+            analyzer.run_benchmark(rt)
+            done.append(time.perf_counter())
+            report = benchmark_report(fed, done)
+    finally:
+        rt.shutdown()
+
+    report["settings"] = {"frames": len(frames), "workers": analyzer.NUM_WORKERS,
+                          "copies_schedule": analyzer.COPIES_SCHEDULE if args.mode != "stream" else None,
+                          "model_complexity": analyzer.MODEL_COMPLEXITY, "infer_scale": analyzer.INFER_SCALE,
+                          "dispatch_mode": analyzer.DISPATCH_MODE, "start_method": analyzer.START_METHOD,
+                          "host": analyzer.socket.gethostname()}
+    print(f"🧾 results CSV: {analyzer.CSV_PATH if args.mode != 'stream' else analyzer._stream_csv_path()}")
+    print_report(report)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"🧾 report: {args.report}")
+
+
+def cmd_record(args):
+    """Capture MQTT frames into a JSONL file for later replay."""
+    import paho.mqtt.client as mqtt
+    lock = threading.Lock()
+    finished = threading.Event()
+    state = {"n": 0, "t0": None}
+    out = open(args.out, "w", encoding="utf-8")
+
+    def on_message(client, userdata, msg):
+        with lock:
+            if finished.is_set():
+                return
+            now = time.time()
+            state["t0"] = state["t0"] or now
+            out.write(json.dumps({"topic": msg.topic, "t": round(now - state["t0"], 6),
+                                  "payload": base64.b64encode(msg.payload).decode("ascii")}) + "\n")
+            state["n"] += 1
+            if state["n"] >= args.count:
+                finished.set()
+
+    def on_connect(client, userdata, flags, rc):
+        if rc == 0:
+            client.subscribe(args.topic)
+        else:
+            print(f"❌ MQTT connection failed with rc={rc}")
+
+    client = mqtt.Client(protocol=mqtt.MQTTv311)
+    client.on_connect = on_connect
+    client.on_message = on_message
+    client.connect(args.broker, args.port, 60)
+    print(f"⏺️ recording {args.count} frames from {args.broker}:{args.port} {args.topic} -> {args.out}")
+    client.loop_start()
+    try:
+        finished.wait(args.duration)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.loop_stop()
+        client.disconnect()
+        with lock:
+            finished.set()
+            out.close()
+    print(f"🧾 recorded {state['n']} frames")
+
+
+def cmd_compare(args):
+    """Side-by-side totals (and per-loop copies/s for benchmark runs) of two replay reports."""
+    with open(args.before, "r", encoding="utf-8") as f:
+        before = json.load(f)
+    with open(args.after, "r", encoding="utf-8") as f:
+        after = json.load(f)
+    print(f"{'':<24}{'before':>14}{'after':>14}{'change':>10}")
+    for key, b in before["total"].items():
+        a = after["total"].get(key)
+        change = f"{(a - b) / b * 100:+.1f}%" if isinstance(a, (int, float)) and isinstance(b, (int, float)) and b else "-"
+        print(f"{key:<24}{b if b is not None else '-':>14}{a if a is not None else '-':>14}{change:>10}")
+    if before["mode"] == after["mode"] == "benchmark":
+        after_loops = {lp["copies"]: lp for lp in after["loops"]}
+        for lp in before["loops"]:
+            other = after_loops.get(lp["copies"])
+            if other and lp["copies_per_second"] and other["copies_per_second"]:
+                print(f"{'copies=' + str(lp['copies']) + ' copies/s':<24}{lp['copies_per_second']:>14}"
+                      f"{other['copies_per_second']:>14}"
+                      f"{(other['copies_per_second'] / lp['copies_per_second'] - 1) * 100:>+9.1f}%")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("run", help="feed frames through the analyzer and report throughput/latency")
+    src = p.add_mutually_exclusive_group(required=True)
+    src.add_argument("--frames", help="image or directory of frames (sent as base64 JPEG, like the Pi)")
+    src.add_argument("--capture", help="JSONL capture written by `replay.py record`")
+    p.add_argument("--mode", choices=("benchmark", "stream"), default="benchmark")
+    p.add_argument("--schedule", type=int, nargs="+", help="copies per loop (default: the analyzer's COPIES_SCHEDULE)")
+    p.add_argument("--csv", default="replay_results.csv", help="results CSV (stream stats go to <stem>_stream.csv)")
+    p.add_argument("--report", help="write the throughput/latency report as JSON")
+    p.add_argument("--pis", type=int, default=1, help="spread --frames over this many Pi topics")
+    p.add_argument("--repeat", type=int, default=1, help="stream mode: passes over the frames")
+    p.add_argument("--rate", type=float, help="stream mode: frames/s (default: capture pace, or as fast as possible)")
+    p.add_argument("--speed", type=float, default=1.0, help="stream mode: capture pace multiplier")
+    p.set_defaults(func=cmd_run)
+
+    p = sub.add_parser("record", help="capture MQTT frames to a JSONL file")
+    p.add_argument("--out", required=True)
+    p.add_argument("--broker", default=os.environ.get("MQTT_BROKER", "192.168.1.79"))
+    p.add_argument("--port", type=int, default=int(os.environ.get("MQTT_PORT", "1883")))
+    p.add_argument("--topic", default=os.environ.get("MQTT_TOPIC", "images/#"))
+    p.add_argument("--count", type=int, default=100)
+    p.add_argument("--duration", type=float, help="stop after this many seconds")
+    p.set_defaults(func=cmd_record)
+
+    p = sub.add_parser("compare", help="compare two --report files")
+    p.add_argument("before")
+    p.add_argument("after")
+    p.set_defaults(func=cmd_compare)
+
+    args = ap.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()